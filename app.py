@@ -1,9 +1,80 @@
-from flask import Flask, jsonify, request
-from main import add_jd_collection, retrieve
+import threading
 
+from flask import Flask, Response, jsonify, request
+
+from config import CONFIG_DATA, get_logger
+from main import add_jd_collection, add_collection, retrieve, match_candidates, components, warm_up, ResumeValidationError
+from src.job_queue import JobQueue, QueueFullError
+from src.metrics import metrics, QUEUE_DEPTH
+from src.jd_filters import FILTER_FIELDS, CANDIDATE_FILTER_FIELDS
+
+
+logger = get_logger("MainModule")
 
 app = Flask(__name__)
 
+job_config = CONFIG_DATA.get('jobs', {})
+job_queue = JobQueue(
+    max_workers=job_config.get('max_workers', 2),
+    max_queue_size=job_config.get('max_queue_size', 32)
+)
+QUEUE_DEPTH.set_function(job_queue.depth, queue="jobs")
+
+warm_up_done = threading.Event()
+warm_up_errors = []
+
+
+def background_warm_up():
+    """Load the components listed under startup.warm_up without blocking the server from starting."""
+    try:
+        warm_up(CONFIG_DATA.get('startup', {}).get('warm_up', []))
+    except Exception as e:
+        logger.error(f"Warm-up failed: {e}")
+        warm_up_errors.append(str(e))
+    finally:
+        warm_up_done.set()
+
+
+threading.Thread(target=background_warm_up, name="WarmUp", daemon=True).start()
+
+
+def request_filters(params, fields=FILTER_FIELDS):
+    """
+    JD filters from request parameters, e.g. ?city=Zurich&position=Senior&position=Lead.
+    A repeated parameter (or a JSON list) accepts any of its values.
+    """
+    filters = {}
+    for field in fields:
+        values = params.getlist(field) if hasattr(params, 'getlist') else params.get(field)
+        if isinstance(values, list) and len(values) == 1:
+            values = values[0]
+        if values:
+            filters[field] = values
+    return filters or None
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Liveness probe: answers as soon as the process is up."""
+    return jsonify({"status": "ok"}), 200
+
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: ready once the configured warm-up components have loaded."""
+    body = {"components": components.status(), "errors": warm_up_errors}
+    if warm_up_done.is_set() and not warm_up_errors:
+        return jsonify({"status": "ready", **body}), 200
+    return jsonify({"status": "loading" if not warm_up_done.is_set() else "failed", **body}), 503
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Per-stage latency histograms, counters and queue depths in the Prometheus text format (?format=json for JSON)."""
+    if request.args.get('format') == 'json':
+        return jsonify(metrics.snapshot()), 200
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 
 @app.route('/add_jd_to_database', methods=['GET'])
 def add_jd_to_database():
@@ -16,6 +87,37 @@ def add_jd_to_database():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/add_resumes_to_database', methods=['GET'])
+def add_resumes_to_database():
+    """Route to add a folder of resumes to the resume index. Resumes already indexed are skipped."""
+    resume_folder = request.args.get('resume_folder')
+    if not resume_folder:
+        return jsonify({"error": "Missing 'resume_folder' parameter"}), 400
+
+    try:
+        added = add_collection(resume_folder)
+        return jsonify({"message": f"Added {added} resumes to the resume index"}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/candidates', methods=['GET', 'POST'])
+def retrieve_candidates():
+    """Route to retrieve the best matching indexed resumes for a job description."""
+    params = request.get_json(silent=True) or request.values
+    job_description = params.get('job_description')
+    top_k = int(params.get('top_k', 10))
+
+    if not job_description:
+        return jsonify({"error": "Missing 'job_description' parameter"}), 400
+
+    try:
+        results = match_candidates([job_description], top_k, filters=request_filters(params, CANDIDATE_FILTER_FIELDS))
+        return jsonify(results[0]), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/retrieve', methods=['GET'])
 def retrieve_collection():
     """Route to retrieve job descriptions based on a resume."""
@@ -26,12 +128,53 @@ def retrieve_collection():
         return jsonify({"error": "Missing 'resume_path' parameter"}), 400
 
     try:
-        results = retrieve(resume_path, top_k)
+        results = retrieve(resume_path, top_k, filters=request_filters(request.args), raise_on_invalid=True)
         return jsonify(results), 200
+    except ResumeValidationError as e:
+        return jsonify({"error": str(e)}), 422
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Route to submit a resume for matching. Returns a job id immediately."""
+    params = request.get_json(silent=True) or request.form
+    resume_path = params.get('resume_path')
+    top_k = int(params.get('top_k', 2))
+
+    if not resume_path:
+        return jsonify({"error": "Missing 'resume_path' parameter"}), 400
+
+    try:
+        # A resume that does not validate fails the job instead of returning the message as its result
+        job = job_queue.submit(retrieve, resume_path, top_k, filters=request_filters(params), raise_on_invalid=True)
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+    return jsonify(job.to_dict()), 202
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Route to report the status and current stage of a job."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return jsonify({**job.to_dict(), "queue_depth": job_queue.depth()}), 200
+
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Route to fetch the result of a finished job."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    if job.status == "failed":
+        return jsonify({"error": job.error, **job.to_dict()}), 500
+    if not job.finished:
+        return jsonify(job.to_dict()), 409
+    return jsonify({"result": job.result, **job.to_dict()}), 200
+
 
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=8000)
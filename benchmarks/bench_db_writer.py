@@ -0,0 +1,93 @@
+"""
+Compare the per-row insert path against the pooled bulk writers on a local PostgreSQL.
+
+Usage:
+    python -m benchmarks.bench_db_writer --resumes 1000 --top-k 5
+
+Rows are written with a `bench://` resume_path prefix and deleted afterwards.
+"""
+import time
+import argparse
+import psycopg2
+
+from utils.save_to_db import db_params, apply_migrations, save_many_to_postgresql, get_pool, close_pool
+
+
+def synthetic_results(num_resumes, top_k, run):
+    return [
+        [
+            {
+                'resume_path': f"bench://{run}/resume_{i}.pdf",
+                'page_content': f"Job: engineer {j}\nPosition: Backend\nLocation: Zurich\nJob Description: [",
+                'similarity_score': round(1.0 - j / (top_k + 1), 2),
+                'chunk_id': f"id_{(i * top_k + j) % 4412}",
+            }
+            for j in range(top_k)
+        ]
+        for i in range(num_resumes)
+    ]
+
+
+def per_row_insert(results_list):
+    """The previous writer: one connection per resume and one INSERT per row."""
+    for results in results_list:
+        conn = psycopg2.connect(**db_params)
+        cur = conn.cursor()
+        for index, result in enumerate(results):
+            cur.execute(
+                """
+                INSERT INTO jd_resume_match_result (resume_path, job_description, similarity_score, chunk_id, rank)
+                VALUES (%s, %s, %s, %s, %s);
+                """,
+                (result['resume_path'], result['page_content'], result['similarity_score'], result['chunk_id'], index)
+            )
+        conn.commit()
+        cur.close()
+        conn.close()
+
+
+def pooled_per_resume(results_list, method):
+    for results in results_list:
+        save_many_to_postgresql([results], method=method)
+
+
+def cleanup():
+    conn = get_pool().getconn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM jd_resume_match_result WHERE resume_path LIKE 'bench://%';")
+        conn.commit()
+    finally:
+        get_pool().putconn(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resumes", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    apply_migrations()
+
+    writers = {
+        "per_row_connect": per_row_insert,
+        "pooled_values_per_resume": lambda results: pooled_per_resume(results, "values"),
+        "pooled_values_single_flush": lambda results: save_many_to_postgresql(results, method="values"),
+        "pooled_copy_single_flush": lambda results: save_many_to_postgresql(results, method="copy"),
+    }
+
+    total_rows = args.resumes * args.top_k
+    try:
+        for run, (name, writer) in enumerate(writers.items()):
+            results_list = synthetic_results(args.resumes, args.top_k, run)
+            start = time.perf_counter()
+            writer(results_list)
+            elapsed = time.perf_counter() - start
+            print(f"{name:28s} {elapsed:8.3f}s  {total_rows / elapsed:10.0f} rows/sec")
+    finally:
+        cleanup()
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Compare encode throughput (sentences/sec) of the embedding backends.
+
+The corpus is built from the sample resume in prompt_tuner/ (or --text-file): each line is a
+sentence, mixed with windows of several lines so lengths vary like real resume chunks.
+Both backends encode the same corpus; the cosine similarity between their vectors is reported
+to check that quantization does not change the embeddings meaningfully.
+
+Usage:
+    python -m benchmarks.bench_embedding_backend --sentences 2000 --output embedding_backends.json
+"""
+import json
+import time
+import argparse
+import numpy as np
+
+from src.onnx_embedding import load_embedding_model
+
+BACKENDS = ("flag", "onnx_int8")
+
+
+def build_corpus(path, size):
+    with open(path, 'r') as file:
+        lines = [' '.join(line.split()) for line in file if line.strip()]
+    sentences = lines + [' '.join(lines[i:i + 8]) for i in range(0, len(lines), 4)]
+    return [sentences[i % len(sentences)] for i in range(size)]
+
+
+def run(backend, model_name, corpus, args):
+    model = load_embedding_model(model_name, backend, onnx_dir=args.onnx_dir, batch_size=args.batch_size)
+    model.encode(corpus[:args.batch_size])  # warm-up
+
+    start = time.perf_counter()
+    embeddings = np.asarray(model.encode(corpus), dtype=np.float32)
+    seconds = time.perf_counter() - start
+    return embeddings, {"backend": backend, "sentences_per_sec": round(len(corpus) / seconds, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="BAAI/bge-base-en-v1.5")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--text-file", default="prompt_tuner/resume_sample_text.txt")
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--onnx-dir", default="data/onnx")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.text_file, args.sentences)
+    embeddings, results = {}, []
+    for backend in args.backends:
+        embeddings[backend], result = run(backend, args.model, corpus, args)
+        results.append(result)
+
+    if len(embeddings) == 2:
+        similarity = np.sum(embeddings["flag"] * embeddings["onnx_int8"], axis=1)
+        results.append({"mean_cosine_flag_vs_onnx_int8": round(float(similarity.mean()), 4),
+                        "min_cosine_flag_vs_onnx_int8": round(float(similarity.min()), 4)})
+
+    for result in results:
+        print(result)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark of the exact search backend (src/exact_search.py) against Chroma's HNSW index.
+
+A Chroma collection of --jds synthetic job descriptions is embedded with the stub encoder of
+benchmarks/stubs.py (random unit vectors, --embedding-dim wide) and --resumes resume queries
+are answered by:
+- chroma_per_query: one query_collection call per resume, the current per-resume path
+- chroma_batch: query_collection_batch on the Chroma backend
+- exact_float32 / exact_float16: query_collection_batch on the exact backend
+The first query of each exact run (building the matrix file) is reported separately as build_seconds.
+Recall is the overlap of each backend's top_k with the exact float32 top_k.
+
+Usage:
+    python -m benchmarks.bench_exact_search --jds 5000 --resumes 2000 --output exact.json
+"""
+import json
+import time
+import argparse
+import tempfile
+
+from benchmarks.stubs import stub_embedding, synthetic_job_descriptions
+
+
+def recall(results, reference):
+    overlaps = [
+        len({r["chunk_id"] for r in result} & {r["chunk_id"] for r in expected}) / max(len(expected), 1)
+        for result, expected in zip(results, reference)
+    ]
+    return round(sum(overlaps) / max(len(overlaps), 1), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jds", type=int, default=5000)
+    parser.add_argument("--resumes", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--embedding-dim", type=int, default=768)
+    parser.add_argument("--block-size", type=int, default=256, help="Resume embeddings per matmul")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    from src.chroma import ChromaDB
+
+    queries = [f"Resume {index}: backend engineer with Python and Kubernetes" for index in range(args.resumes)]
+    resume_paths = [f"candidate_{index:05d}.pdf" for index in range(args.resumes)]
+    results = {"jds": args.jds, "resumes": args.resumes, "top_k": args.top_k}
+
+    with tempfile.TemporaryDirectory(prefix="bench_exact_") as workdir:
+        chroma_client = ChromaDB(db_path=workdir, embedding_model=stub_embedding(args.embedding_dim))
+        collection = chroma_client.get_or_create_collection("bench")
+        chroma_client.add_to_collection(collection, synthetic_job_descriptions(args.jds))
+
+        def run(name, fn):
+            start = time.perf_counter()
+            output = fn()
+            seconds = time.perf_counter() - start
+            results[name] = {"seconds": round(seconds, 4), "ms_per_resume": round(seconds / args.resumes * 1000, 4)}
+            return output
+
+        chroma_per_query = run("chroma_per_query", lambda: [
+            chroma_client.query_collection(collection, query, path, top_k=args.top_k)
+            for query, path in zip(queries, resume_paths)
+        ])
+        chroma_batch = run("chroma_batch", lambda: chroma_client.query_collection_batch(
+            collection, queries, resume_paths, top_k=args.top_k
+        ))
+
+        exact = {}
+        chroma_client.search_backend = "exact"
+        for dtype in ("float32", "float16"):
+            chroma_client.exact_options = {"dtype": dtype, "block_size": args.block_size}
+            chroma_client.exact_indexes.clear()
+            start = time.perf_counter()
+            chroma_client.exact_index(collection)
+            build_seconds = time.perf_counter() - start
+            exact[dtype] = run(f"exact_{dtype}", lambda: chroma_client.query_collection_batch(
+                collection, queries, resume_paths, top_k=args.top_k
+            ))
+            results[f"exact_{dtype}"]["build_seconds"] = round(build_seconds, 4)
+
+        results["recall_at_k"] = {
+            "chroma_per_query": recall(chroma_per_query, exact["float32"]),
+            "chroma_batch": recall(chroma_batch, exact["float32"]),
+            "exact_float16": recall(exact["float16"], exact["float32"]),
+        }
+
+    print(json.dumps(results, indent=4))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
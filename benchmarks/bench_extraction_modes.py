@@ -0,0 +1,134 @@
+"""
+Compare latency and accuracy of the extraction modes on the train set.
+
+For every resume and every mode (two_pass, single_pass, auto) this records the extraction
+latency, the path taken and whether the output validated. Accuracy is reported two ways:
+- agreement with the two-pass output on name, email and skills
+- precision/recall/accuracy of the top match against train.csv, using the README's 0.8 threshold
+
+Usage:
+    python -m benchmarks.bench_extraction_modes --limit 50 --output extraction_modes.json
+"""
+import os
+import json
+import time
+import argparse
+import pandas as pd
+
+from main import components, path_to_train_resume, path_to_train_csv
+
+MODES = ("two_pass", "single_pass", "auto")
+
+
+def skills_of(data):
+    skills = set()
+    for skill in data.get("skills") or []:
+        skills.add(json.dumps(skill, sort_keys=True, default=str).lower() if isinstance(skill, dict) else str(skill).lower())
+    return skills
+
+
+def agreement(data, reference):
+    """Share of name/email/skills that match the two-pass reference extraction."""
+    basics, reference_basics = data.get("basics") or {}, reference.get("basics") or {}
+    skills, reference_skills = skills_of(data), skills_of(reference)
+    union = skills | reference_skills
+    return {
+        "name": basics.get("name") == reference_basics.get("name"),
+        "email": basics.get("email") == reference_basics.get("email"),
+        "skills_jaccard": len(skills & reference_skills) / len(union) if union else 1.0,
+    }
+
+
+def run_mode(mode, resume_files, texts):
+    from utils.resume_validator_and_processor import ResumeProcessor
+
+    llm = components.get("llm")
+    llm.extraction_mode = mode
+    validator = ResumeProcessor(llm)
+
+    rows = {}
+    for path in resume_files:
+        start = time.perf_counter()
+        chosen_path = llm.choose_path(texts[path])
+        result, flag = validator.validate_and_process(texts[path], llm(texts[path]))
+        rows[path] = {
+            "latency_s": time.perf_counter() - start,
+            "path": chosen_path,
+            "valid": bool(flag),
+            "data": result if flag else None,
+        }
+    return rows
+
+
+def top_match_metrics(rows, train_csv, id_column, score_column, threshold=0.8):
+    import torch
+    from utils.evaluate import calculate_metrics_torch
+
+    labels = pd.read_csv(train_csv).set_index(id_column)[score_column]
+    chroma_client, collection = components.get("chroma")
+
+    y_true, y_pred = [], []
+    for path, row in rows.items():
+        candidate_id = os.path.splitext(os.path.basename(path))[0]
+        if row["data"] is None or candidate_id not in labels.index:
+            continue
+        matches = chroma_client.query_collection(collection, json.dumps(row["data"], default=str), path, top_k=1)
+        y_true.append(float(labels[candidate_id]) / 100 >= threshold)
+        y_pred.append(bool(matches) and matches[0]["similarity_score"] >= threshold)
+
+    if not y_true:
+        return None
+    return calculate_metrics_torch(torch.tensor(y_true).int(), torch.tensor(y_pred).int())
+
+
+def summarize(rows, reference_rows):
+    latencies = sorted(row["latency_s"] for row in rows.values())
+    agreements = [
+        agreement(row["data"], reference_rows[path]["data"])
+        for path, row in rows.items()
+        if row["data"] is not None and reference_rows[path]["data"] is not None
+    ]
+    return {
+        "resumes": len(rows),
+        "mean_latency_s": round(sum(latencies) / len(latencies), 3),
+        "p50_latency_s": round(latencies[len(latencies) // 2], 3),
+        "valid_rate": round(sum(row["valid"] for row in rows.values()) / len(rows), 3),
+        "single_pass_share": round(sum(row["path"] == "single_pass" for row in rows.values()) / len(rows), 3),
+        "name_agreement": round(sum(a["name"] for a in agreements) / len(agreements), 3) if agreements else None,
+        "email_agreement": round(sum(a["email"] for a in agreements) / len(agreements), 3) if agreements else None,
+        "skills_jaccard": round(sum(a["skills_jaccard"] for a in agreements) / len(agreements), 3) if agreements else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resume-dir", default=path_to_train_resume)
+    parser.add_argument("--train-csv", default=path_to_train_csv)
+    parser.add_argument("--id-column", default="CandidateID")
+    parser.add_argument("--score-column", default="Match Percentage")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    resume_files = [
+        os.path.join(args.resume_dir, file) for file in sorted(os.listdir(args.resume_dir)) if file.endswith(".pdf")
+    ][:args.limit]
+    reader = components.get("reader")
+    texts = {path: reader.doc_markdown(path) for path in resume_files}
+
+    rows_by_mode = {mode: run_mode(mode, resume_files, texts) for mode in MODES}
+
+    report = {}
+    for mode, rows in rows_by_mode.items():
+        report[mode] = summarize(rows, rows_by_mode["two_pass"])
+        if os.path.exists(args.train_csv):
+            report[mode]["top_match_metrics"] = top_match_metrics(rows, args.train_csv, args.id_column, args.score_column)
+        print(f"{mode:12s} {report[mode]}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
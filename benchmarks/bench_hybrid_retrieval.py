@@ -0,0 +1,104 @@
+"""
+Micro-benchmark of the BM25 side of hybrid retrieval (src/sparse_index.py).
+
+Builds the inverted index over --jds synthetic job descriptions in --batch-size batches, then
+reports the build time, the size of the persisted index and the latency of lexical candidate
+generation (BM25Index.search) for short keyword queries and for whole resume-length queries,
+which are what query_collection sends.
+
+Usage:
+    python -m benchmarks.bench_hybrid_retrieval --jds 5000 --output hybrid.json
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import numpy as np
+
+from src.sparse_index import BM25Index
+
+SKILLS = ["Python", "SQL", "PyTorch", "Kubernetes", "React", "Go", "Spark", "AWS", "Docker", "Terraform",
+          "SAP FICO", "C++", "C#", "Java", "Scala", "Airflow", "Tableau", "Salesforce", "Figma", "Excel"]
+ROLES = ["Backend Engineer", "Data Scientist", "ML Engineer", "DevOps Engineer", "Frontend Developer",
+         "Financial Analyst", "Product Designer", "Sales Manager"]
+CITIES = ["Zurich", "Berlin", "Pune", "Toronto", "Lisbon"]
+
+
+def vocabulary_words(count, seed=0):
+    rng = random.Random(seed)
+    return ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 10))) for _ in range(count)]
+
+
+def synthetic_texts(count, words, length, seed):
+    rng = random.Random(seed)
+    return [
+        f"Job: {rng.choice(ROLES)}\nLocation: {rng.choice(CITIES)}\nJob Description: "
+        f"{', '.join(rng.sample(SKILLS, 4))}. {' '.join(rng.choices(words, k=length))}"
+        for _ in range(count)
+    ]
+
+
+def latency_us(index, queries, top_k, repeats):
+    timings = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, top_k)
+            timings.append(time.perf_counter() - start)
+    timings = np.asarray(timings) * 1e6
+    return {"p50": round(float(np.percentile(timings, 50)), 1), "p99": round(float(np.percentile(timings, 99)), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jds", type=int, default=5000)
+    parser.add_argument("--jd-words", type=int, default=150, help="Description words per JD")
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--resume-words", type=int, default=600, help="Words per resume-length query")
+    parser.add_argument("--top-k", type=int, default=8, help="Lexical candidates per query (top_k * candidate_factor)")
+    parser.add_argument("--max-query-terms", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    words = vocabulary_words(args.vocabulary)
+    documents = synthetic_texts(args.jds, words, args.jd_words, seed=1)
+    rng = random.Random(2)
+    keyword_queries = [" ".join(rng.sample(SKILLS, 2) + [rng.choice(ROLES)]) for _ in range(args.queries)]
+    resume_queries = synthetic_texts(args.queries, words, args.resume_words, seed=3)
+
+    with tempfile.TemporaryDirectory(prefix="bench_hybrid_") as workdir:
+        path = os.path.join(workdir, "bm25.npz")
+        index = BM25Index(path, max_query_terms=args.max_query_terms)
+        start = time.perf_counter()
+        for offset in range(0, len(documents), args.batch_size):
+            batch = documents[offset:offset + args.batch_size]
+            index.add([f"id_{offset + i}" for i in range(len(batch))], batch, commit=False)
+        index.commit()
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        loaded = BM25Index(path, max_query_terms=args.max_query_terms)
+        load_seconds = time.perf_counter() - start
+        results = {
+            "jds": len(loaded),
+            "postings": int(len(loaded.posting_docs)),
+            "build_seconds": round(build_seconds, 3),
+            "load_seconds": round(load_seconds, 3),
+            "index_mb": round(os.path.getsize(path) / 2 ** 20, 2),
+            "keyword_query_us": latency_us(loaded, keyword_queries, args.top_k, args.repeats),
+            "resume_query_us": latency_us(loaded, resume_queries, args.top_k, args.repeats),
+        }
+
+    print(results)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
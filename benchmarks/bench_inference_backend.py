@@ -0,0 +1,89 @@
+"""
+Compare tokens/sec and peak RSS of the LLM inference backends on CPU.
+
+Each backend runs in its own process so peak RSS is measured per backend. The extraction
+prompt uses the sample resume in prompt_tuner/, greedy decoding and batch size 1.
+
+Usage:
+    HF_HUB_OFFLINE=1 python -m benchmarks.bench_inference_backend --model Qwen/Qwen2.5-0.5B-Instruct
+"""
+import json
+import time
+import resource
+import argparse
+import multiprocessing
+
+from utils.file_reader import text_reader
+
+
+def measure(model_name, backend, max_new_tokens, repeats, results):
+    import torch
+    from transformers import AutoTokenizer
+    from src.inference_backend import load_model
+
+    start = time.perf_counter()
+    model = load_model(model_name, backend=backend, device=torch.device("cpu"))
+    load_seconds = time.perf_counter() - start
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    messages = [
+        {"role": "system", "content": "Extract the resume below as JSON."},
+        {"role": "user", "content": text_reader()}
+    ]
+    input_ids = tokenizer.apply_chat_template(messages, add_generation_prompt=True, return_tensors="pt")
+
+    def generate():
+        with torch.inference_mode():
+            output = model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                max_new_tokens=max_new_tokens,
+                min_new_tokens=max_new_tokens,
+                do_sample=False
+            )
+        return output.shape[1] - input_ids.shape[1]
+
+    generate()  # warm-up, includes compilation for compiled backends
+    start = time.perf_counter()
+    new_tokens = sum(generate() for _ in range(repeats))
+    seconds = time.perf_counter() - start
+
+    results.put({
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "prompt_tokens": input_ids.shape[1],
+        "tokens_per_sec": round(new_tokens / seconds, 2),
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="Qwen/Qwen2.5-0.5B-Instruct")
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8_dynamic", "int4_weight_only"])
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    report = []
+    for backend in args.backends:
+        process = context.Process(target=measure, args=(args.model, backend, args.max_new_tokens, args.repeats, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            report.append({"backend": backend, "error": f"exited with code {process.exitcode}"})
+        else:
+            report.append(results.get())
+        print(report[-1])
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
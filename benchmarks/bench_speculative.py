@@ -0,0 +1,75 @@
+"""
+Measure tokens/sec and acceptance rate of speculative decoding for JSON extraction.
+
+Runs the extraction prompt over the sample resume in prompt_tuner/ (or --resume-text) once
+with plain decoding and once per speculative mode, with batch size 1.
+
+Usage:
+    python -m benchmarks.bench_speculative --model Qwen/Qwen2.5-7B-Instruct \
+        --draft-model Qwen/Qwen2.5-0.5B-Instruct --repeats 3
+"""
+import json
+import time
+import argparse
+
+from src.llm_caller import LLM
+from utils.file_reader import text_reader
+
+MODES = ("off", "prompt_lookup", "draft")
+
+
+def run(model_name, mode, args, resume_text):
+    speculative = None
+    if mode == "prompt_lookup":
+        speculative = {"mode": mode, "prompt_lookup_num_tokens": args.prompt_lookup_num_tokens}
+    elif mode == "draft":
+        speculative = {"mode": mode, "draft_model": args.draft_model, "num_assistant_tokens": args.num_assistant_tokens}
+
+    llm = LLM(
+        model_name=model_name,
+        max_new_tokens=args.max_new_tokens,
+        max_batch_size=1,
+        extraction_mode="single_pass",
+        speculative=speculative
+    )
+    llm.extract(resume_text)  # warm-up, also fills the prefix cache
+    if llm.speculative_decoder:
+        llm.speculative_decoder.reset_stats()
+
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        llm.extract(resume_text)
+    elapsed = time.perf_counter() - start
+
+    result = {"mode": mode, "seconds_per_extraction": round(elapsed / args.repeats, 3)}
+    if llm.speculative_decoder:
+        result.update(llm.decoding_stats())
+    llm.engine.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="Qwen/Qwen2.5-7B-Instruct")
+    parser.add_argument("--draft-model", default="Qwen/Qwen2.5-0.5B-Instruct")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--resume-text", default=None, help="Path to a resume text file")
+    parser.add_argument("--max-new-tokens", type=int, default=512)
+    parser.add_argument("--num-assistant-tokens", type=int, default=5)
+    parser.add_argument("--prompt-lookup-num-tokens", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    resume_text = text_reader(args.resume_text) if args.resume_text else text_reader()
+    results = [run(args.model, mode, args, resume_text) for mode in args.modes]
+
+    for result in results:
+        print(result)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
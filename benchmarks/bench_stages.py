@@ -0,0 +1,226 @@
+"""
+Offline per-stage and end-to-end benchmark with stub models.
+
+The LLM, the embedding model, the gender classifier and PostgreSQL are replaced by the
+deterministic stubs in benchmarks/stubs.py, each with a configurable latency; PDF parsing,
+chunking, validation, Chroma and the pipeline in main.py run for real on synthetic resumes
+and job descriptions written to a temporary directory.
+
+Stages: parse (DOC_READER.doc_markdown), chunking, validation, add_to_collection,
+query_collection, query_collection_batch and db_write (values and copy, serialized but not sent).
+The end-to-end run goes through main.process_resume_folder once per --sizes entry.
+
+Results are written as JSON; --compare reports every stage or size that got slower than the
+baseline by more than --tolerance and exits with status 1 if there is any.
+
+Usage:
+    python -m benchmarks.bench_stages --sizes 10 50 200 --output stages.json
+    python -m benchmarks.bench_stages --sizes 10 50 200 --compare stages.json --tolerance 0.2
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from benchmarks.stubs import (
+    StubLLM, StubGenderClassifier, StubConnectionPool, stub_embedding, write_resume_pdfs, synthetic_job_descriptions
+)
+
+
+def timed(fn, items):
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    return {
+        "items": items,
+        "seconds": round(seconds, 4),
+        "items_per_sec": round(items / seconds, 2) if seconds else None,
+        "ms_per_item": round(seconds / items * 1000, 3) if items else None,
+    }
+
+
+def stub_db():
+    """Route utils.save_to_db through a stub pool."""
+    from utils import save_to_db
+    save_to_db._pool = StubConnectionPool()
+
+
+def bench_stages(args, workdir):
+    from markitdown import MarkItDown
+    from src.reader import DOC_READER
+    from src.chroma import ChromaDB
+    from src.llm_caller import JSON_BLOCK_PATTERN
+    from utils.save_to_db import save_many_to_postgresql
+    from utils.resume_validator_and_processor import ResumeProcessor
+
+    resume_dir = os.path.join(workdir, "stage_resumes")
+    os.makedirs(resume_dir)
+    paths = write_resume_pdfs(resume_dir, args.stage_size)
+    stages = {}
+
+    reader = DOC_READER(MarkItDown())
+    texts = []
+    stages["parse"] = timed(lambda: texts.extend(reader.doc_markdown(path) for path in paths), len(paths))
+
+    llm = StubLLM()
+    stages["chunking"] = timed(lambda: [llm.chunk_text(text, args.chunk_budget) for text in texts], len(texts))
+
+    outputs = [JSON_BLOCK_PATTERN.search(llm.engine.generate([text])[0]) for text in texts]
+    validator = ResumeProcessor(llm)
+    extracted = []
+    stages["validation"] = timed(
+        lambda: extracted.extend(validator.validate_and_process(text, output)[0] for text, output in zip(texts, outputs)),
+        len(texts)
+    )
+
+    chroma_client = ChromaDB(
+        db_path=os.path.join(workdir, "stage_chroma"),
+        embedding_model=stub_embedding(args.embedding_dim, args.embedding_latency_ms / 1000)
+    )
+    collection = chroma_client.get_or_create_collection("bench")
+    job_descriptions = synthetic_job_descriptions(args.jds)
+    stages["add_to_collection"] = timed(lambda: chroma_client.add_to_collection(collection, job_descriptions), args.jds)
+
+    queries = [json.dumps(data, default=str) for data in extracted]
+    matches = []
+    stages["query_collection"] = timed(
+        lambda: matches.extend(
+            chroma_client.query_collection(collection, query, path, top_k=args.top_k) for query, path in zip(queries, paths)
+        ),
+        len(queries)
+    )
+    stages["query_collection_batch"] = timed(
+        lambda: chroma_client.query_collection_batch(collection, queries, paths, top_k=args.top_k), len(queries)
+    )
+
+    stub_db()
+    rows = sum(len(results) for results in matches)
+    for method in ("values", "copy"):
+        stages[f"db_write_{method}"] = timed(lambda: save_many_to_postgresql(matches, method=method), rows)
+    return stages
+
+
+def bench_end_to_end(size, args, workdir):
+    import main
+    from src.chroma import ChromaDB
+    from utils.extraction_cache import ExtractionCache
+    from utils.resume_validator_and_processor import ResumeProcessor
+
+    directory = os.path.join(workdir, f"end_to_end_{size}")
+    resume_dir = os.path.join(directory, "resumes")
+    os.makedirs(resume_dir)
+    write_resume_pdfs(resume_dir, size)
+
+    llm = StubLLM(seconds_per_call=args.llm_latency_ms / 1000)
+    chroma_client = ChromaDB(
+        db_path=os.path.join(directory, "chroma"),
+        embedding_model=stub_embedding(args.embedding_dim, args.embedding_latency_ms / 1000)
+    )
+    collection = chroma_client.get_or_create_collection("bench")
+    chroma_client.add_to_collection(collection, synthetic_job_descriptions(args.jds))
+
+    main.components.override("llm", llm)
+    main.components.override("validator", ResumeProcessor(llm))
+    main.components.override("gender_classifier", StubGenderClassifier(args.gender_latency_ms / 1000))
+    main.components.override("chroma", (chroma_client, collection))
+    # A fresh cache per size, so every run extracts every resume
+    main.components.override("extraction_cache", ExtractionCache(os.path.join(directory, "cache.sqlite"), "stub", "bench"))
+    stub_db()
+
+    output = []
+    result = timed(
+        lambda: output.extend(main.process_resume_folder(resume_dir, top_k=args.top_k, parse_workers=args.parse_workers)),
+        size
+    )
+    results, stage_report = output
+    result["matched"] = sum(isinstance(matches, list) for matches in results.values())
+    result["pipeline_stages"] = stage_report
+    return result
+
+
+def compare(current, baseline, tolerance):
+    """
+    Entries of current whose ms_per_item exceeds the baseline's by more than `tolerance` (a fraction).
+    """
+    regressions = []
+    for section in ("stages", "end_to_end"):
+        for name, entry in current.get(section, {}).items():
+            reference = baseline.get(section, {}).get(name)
+            if not reference or not reference.get("ms_per_item") or entry.get("ms_per_item") is None:
+                continue
+            change = entry["ms_per_item"] / reference["ms_per_item"] - 1
+            if change > tolerance:
+                regressions.append({
+                    "name": f"{section}.{name}",
+                    "baseline_ms_per_item": reference["ms_per_item"],
+                    "ms_per_item": entry["ms_per_item"],
+                    "change": round(change, 3),
+                })
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 50, 200], help="End-to-end corpus sizes")
+    parser.add_argument("--stage-size", type=int, default=50, help="Resumes used by the per-stage benchmarks")
+    parser.add_argument("--jds", type=int, default=1000, help="Synthetic job descriptions in the collection")
+    parser.add_argument("--top-k", type=int, default=2)
+    parser.add_argument("--chunk-budget", type=int, default=256, help="Stub tokens per chunk")
+    parser.add_argument("--parse-workers", type=int, default=None)
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="Per generation call")
+    parser.add_argument("--embedding-latency-ms", type=float, default=1.0, help="Per embedded text")
+    parser.add_argument("--embedding-dim", type=int, default=768)
+    parser.add_argument("--gender-latency-ms", type=float, default=5.0, help="Per classified resume")
+    parser.add_argument("--skip-stages", action="store_true")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None, help="Baseline JSON written by an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "args": vars(args),
+        }
+    }
+    with tempfile.TemporaryDirectory(prefix="bench_stages_") as workdir:
+        if not args.skip_stages:
+            report["stages"] = bench_stages(args, workdir)
+            for name, entry in report["stages"].items():
+                print(f"{name:24s} {entry['ms_per_item']:10.3f} ms/item  {entry['items_per_sec']:10.1f} items/sec")
+        report["end_to_end"] = {}
+        for size in args.sizes:
+            entry = bench_end_to_end(size, args, workdir)
+            report["end_to_end"][str(size)] = entry
+            print(f"end_to_end {size:<13d} {entry['ms_per_item']:10.3f} ms/item  {entry['items_per_sec']:10.1f} items/sec")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Micro-benchmark of the per-resume validation cost.
+
+Uses the sample extraction in prompt_tuner/ with its dates rewritten to dd/mm/yyyy (so it
+validates), and reports microseconds per resume for:
+- model: Resume(**data).model_dump(mode="json"), the previous path
+- engine: the section-wise ResumeValidator on the full document
+- retry: re-validating only the repaired sections of a retry (--retry-sections)
+- bulk: validate_many over --documents copies
+
+Usage:
+    python -m benchmarks.bench_validation --documents 5000 --output validation.json
+"""
+import re
+import json
+import time
+import argparse
+
+from utils.file_reader import json_reader
+from utils.validator import Resume
+from utils.validation_engine import resume_validator
+
+ISO_DATE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+
+
+def valid_sample(path):
+    """The sample extraction, with ISO and open-ended dates turned into dd/mm/yyyy."""
+    def fix(value):
+        if isinstance(value, dict):
+            return {key: fix_date(key, item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [fix(item) for item in value]
+        return value
+
+    def fix_date(key, value):
+        if key in ("startDate", "endDate", "date", "releaseDate") and isinstance(value, str):
+            match = ISO_DATE.match(value)
+            return f"{match.group(3)}/{match.group(2)}/{match.group(1)}" if match else "01/01/2024"
+        return fix(value)
+
+    return fix(json_reader(path))
+
+
+def per_resume_us(fn, count, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return round(best / count * 1e6, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sample", default="prompt_tuner/json_response_sample_schema.json")
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--retry-sections", nargs="+", default=["work"])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    data = valid_sample(args.sample)
+    resume_validator.validate(data)  # fails loudly if the sample does not validate
+    documents = [json.loads(json.dumps(data)) for _ in range(args.documents)]
+    for index, document in enumerate(documents):
+        # Distinct emails, so nothing downstream can profit from identical inputs
+        document["basics"]["email"] = f"candidate{index}@example.com"
+    validated = resume_validator.validate(data)
+
+    def model():
+        for document in documents:
+            Resume(**document).model_dump(mode="json")
+
+    def engine():
+        for document in documents:
+            resume_validator.validate(document)
+
+    def retry():
+        for document in documents:
+            resume_validator.validate(document, sections=args.retry_sections, validated=validated)
+
+    def bulk():
+        resume_validator.validate_many(documents)
+
+    results = {
+        name: per_resume_us(fn, len(documents), args.repeats)
+        for name, fn in (("model", model), ("engine", engine), ("retry", retry), ("bulk", bulk))
+    }
+    results = {"documents": len(documents), "us_per_resume": results}
+
+    print(results)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
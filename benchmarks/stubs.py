@@ -0,0 +1,261 @@
+"""
+Deterministic stand-ins for the heavy components, with configurable latency, and synthetic corpora.
+
+The stubs plug into the real code paths: StubLLM keeps the real prompt assembly, chunking and
+path routing and only replaces the tokenizer and the generation engine; the stub encoder sits
+behind the real CustomEmbedding; StubConnectionPool replaces the PostgreSQL pool of utils.save_to_db.
+"""
+import os
+import re
+import json
+import time
+import zlib
+import random
+import threading
+import numpy as np
+
+from concurrent.futures import Future
+
+from src.llm_caller import LLM
+from benchmarks.bench_validation import valid_sample
+
+TOKEN_PATTERN = re.compile(r"\s+|[^\s]+")
+
+FIRST_NAMES = ["Anna", "Ravi", "Mei", "Lukas", "Sara", "Omar", "Elena", "Kenji", "Priya", "Tom"]
+LAST_NAMES = ["Meier", "Patel", "Chen", "Novak", "Rossi", "Haddad", "Silva", "Sato", "Iyer", "Brown"]
+ROLES = ["Backend Engineer", "Data Scientist", "ML Engineer", "DevOps Engineer", "Frontend Developer"]
+SKILLS = ["Python", "SQL", "PyTorch", "Kubernetes", "React", "Go", "Spark", "AWS", "Docker", "Terraform"]
+CITIES = ["Zurich", "Berlin", "Pune", "Toronto", "Lisbon"]
+
+
+class StubTokenizer:
+    """
+    Splits text into runs of whitespace and non-whitespace, so decode(encode(text)) == text.
+    """
+    def __init__(self):
+        self.vocab = {}
+        self.pieces = []
+        self.lock = threading.Lock()
+
+    def _ids(self, text):
+        ids = []
+        for piece in TOKEN_PATTERN.findall(text):
+            if piece not in self.vocab:
+                with self.lock:
+                    if piece not in self.vocab:
+                        self.vocab[piece] = len(self.pieces)
+                        self.pieces.append(piece)
+            ids.append(self.vocab[piece])
+        return ids
+
+    def __call__(self, text, add_special_tokens=False):
+        if isinstance(text, str):
+            return {"input_ids": self._ids(text)}
+        return {"input_ids": [self._ids(item) for item in text]}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return "".join(self.pieces[i] for i in ids)
+
+    def apply_chat_template(self, messages, tokenize=True, add_generation_prompt=True):
+        text = "".join(f"<|{message['role']}|>\n{message['content']}\n" for message in messages)
+        if add_generation_prompt:
+            text += "<|assistant|>\n"
+        return self._ids(text) if tokenize else text
+
+
+class StubGenerationEngine:
+    """
+    Answers every prompt with a fenced JSON resume after `seconds_per_call`. The email is derived
+    from the prompt, so distinct resumes produce distinct extractions.
+    """
+    def __init__(self, response, seconds_per_call=0.0):
+        self.response = response
+        self.seconds_per_call = seconds_per_call
+        self.calls = 0
+
+    def _answer(self, input_ids):
+        self.calls += 1
+        if self.seconds_per_call:
+            time.sleep(self.seconds_per_call)
+        data = dict(self.response)
+        data["basics"] = {**data["basics"], "email": f"candidate{zlib.crc32(str(input_ids).encode())}@example.com"}
+        return f"```json\n{json.dumps(data)}\n```"
+
+    def submit(self, input_ids, max_new_tokens=None, prefix_key=None, prefix_length=0, logits_processor_factory=None):
+        future = Future()
+        future.set_result(self._answer(input_ids))
+        return future
+
+    def generate(self, prompts, max_new_tokens=None, prefix_key=None, prefix_length=0, logits_processor_factory=None):
+        return [self._answer(prompt) for prompt in prompts]
+
+    def stop(self):
+        pass
+
+
+class StubLLM(LLM):
+    def __init__(self, seconds_per_call=0.0, max_context_length=4096, max_new_tokens=512, max_chunk_size=None,
+                 extraction_mode="auto", single_pass_max_tokens=None, sample="prompt_tuner/json_response_sample_schema.json"):
+        self.model_name = "stub"
+        self.extraction_mode = extraction_mode
+        self.single_pass_max_tokens = single_pass_max_tokens
+        self.max_chunk_size = max_chunk_size
+        self.max_context_length = max_context_length
+        self.max_new_tokens = max_new_tokens
+        self.tokenizer = StubTokenizer()
+        self.speculative_decoder = None
+        self.engine = StubGenerationEngine(valid_sample(sample), seconds_per_call)
+        self.prompt_parts_cache = {}
+        self.constrained_decoding = False
+
+
+class StubEncoder:
+    """
+    Same interface as FlagModel.encode: unit-norm float32 vectors seeded by the text.
+    """
+    def __init__(self, dim=768, seconds_per_text=0.0):
+        self.dim = dim
+        self.seconds_per_text = seconds_per_text
+
+    def encode(self, texts):
+        if self.seconds_per_text:
+            time.sleep(self.seconds_per_text * len(texts))
+        vectors = np.stack([
+            np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(self.dim, dtype=np.float32)
+            for text in texts
+        ])
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def stub_embedding(dim=768, seconds_per_text=0.0):
+    """
+    A real CustomEmbedding (no cache) running the stub encoder.
+    """
+    from src.chroma import CustomEmbedding
+    embedding = CustomEmbedding(model_name="stub")
+    embedding._embedding_model = StubEncoder(dim, seconds_per_text)
+    return embedding
+
+
+class StubGenderClassifier:
+    def __init__(self, seconds_per_text=0.0):
+        self.seconds_per_text = seconds_per_text
+
+    def classify_batch(self, texts):
+        if self.seconds_per_text:
+            time.sleep(self.seconds_per_text * len(texts))
+        return ["Unknown"] * len(texts)
+
+    def __call__(self, text):
+        return self.classify_batch([text])[0]
+
+
+class StubCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def mogrify(self, query, args=None):
+        # execute_values passes a bytes template with one %s per column
+        return query if args is None else query % tuple(repr(arg).encode("utf-8") for arg in args)
+
+    def execute(self, query, args=None):
+        self.connection.statements += 1
+
+    def copy_expert(self, query, buffer):
+        self.connection.bytes_copied += len(buffer.read())
+        self.connection.statements += 1
+
+
+class StubConnection:
+    encoding = "UTF8"
+
+    def __init__(self, seconds_per_commit):
+        self.seconds_per_commit = seconds_per_commit
+        self.statements = 0
+        self.bytes_copied = 0
+
+    def cursor(self):
+        return StubCursor(self)
+
+    def commit(self):
+        if self.seconds_per_commit:
+            time.sleep(self.seconds_per_commit)
+
+    def rollback(self):
+        pass
+
+
+class StubConnectionPool:
+    """
+    Drop-in for ThreadedConnectionPool: rows are serialized as for PostgreSQL but never sent.
+    """
+    def __init__(self, seconds_per_commit=0.0):
+        self.connection = StubConnection(seconds_per_commit)
+
+    def getconn(self):
+        return self.connection
+
+    def putconn(self, conn):
+        pass
+
+    def closeall(self):
+        pass
+
+
+def synthetic_resume(index, experience_entries=3):
+    """Markdown resume; the seed makes every index reproducible and distinct."""
+    rng = random.Random(index)
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    lines = [f"# {name}", f"{name.split()[0].lower()}{index}@example.com | {rng.choice(CITIES)}", "",
+             "## Summary", f"{rng.choice(ROLES)} with {rng.randint(2, 15)} years of experience building "
+             f"production systems in {', '.join(rng.sample(SKILLS, 3))}.", "", "## Experience"]
+    for entry in range(experience_entries):
+        start = rng.randint(2008, 2020)
+        lines += [f"### {rng.choice(ROLES)}, Company {rng.randint(1, 500)} ({start} - {start + rng.randint(1, 4)})",
+                  *[f"- Delivered project {rng.randint(1, 99)} using {rng.choice(SKILLS)}, "
+                    f"improving throughput by {rng.randint(5, 80)}%." for _ in range(rng.randint(2, 5))], ""]
+    lines += ["## Education", f"MSc Computer Science, University of {rng.choice(CITIES)} ({rng.randint(2004, 2015)})",
+              "", "## Skills", ", ".join(rng.sample(SKILLS, 6))]
+    return "\n".join(lines)
+
+
+def write_resume_pdfs(directory, count, experience_entries=3, lines_per_page=60):
+    """Write `count` synthetic resumes as PDFs into directory and return their paths."""
+    import fitz
+
+    paths = []
+    for index in range(count):
+        lines = synthetic_resume(index, experience_entries).split("\n")
+        document = fitz.open()
+        for start in range(0, len(lines), lines_per_page):
+            page = document.new_page()
+            page.insert_text((50, 60), "\n".join(lines[start:start + lines_per_page]), fontsize=9)
+        path = os.path.join(directory, f"candidate_{index:05d}.pdf")
+        document.save(path)
+        document.close()
+        paths.append(path)
+    return paths
+
+
+def synthetic_job_descriptions(count):
+    from main import jd_page_content, jd_metadata
+
+    documents = []
+    for index in range(count):
+        rng = random.Random(-1 - index)
+        job, position, location = rng.choice(ROLES), rng.choice(["Junior", "Senior", "Lead"]), rng.choice(CITIES)
+        # Stored like the JD CSV: a list literal in a string
+        description = str([f"We are looking for a {job} fluent in {', '.join(rng.sample(SKILLS, 4))}.",
+                           f"You will own production systems in {location}."])
+        documents.append({
+            'page_content': jd_page_content(job, position, location, description),
+            'metadata': jd_metadata(job, position, location),
+            'idx': index
+        })
+    return documents
@@ -19,4 +19,14 @@ class LoadTestUser(HttpUser):
         self.client.get("/api/retrieve", params={
             "resume_path": os.path.join(base_path, "data/dataset/trainResumes/candidate_001.pdf"),
             "top_k": 2
-        })
\ No newline at end of file
+        })
+
+    @task
+    def test_submit_job(self):
+        """Test the asynchronous /api/jobs endpoint."""
+        response = self.client.post("/api/jobs", json={
+            "resume_path": os.path.join(base_path, "data/dataset/trainResumes/candidate_001.pdf"),
+            "top_k": 2
+        })
+        if response.status_code == 202:
+            self.client.get(f"/api/jobs/{response.json()['job_id']}", name="/api/jobs/[job_id]")
\ No newline at end of file
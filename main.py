@@ -1,24 +1,26 @@
 import os
+import ast
 import json
+import time
 import pandas as pd
 import concurrent.futures
 
-from huggingface_hub import login
-from markitdown import MarkItDown
+_import_start = time.perf_counter()
 
-from config import CONFIG_DATA
-from src.llm_caller import LLM
-from src.reader import DOC_READER
-from src.chroma import setup_chromadb
+from src.registry import ComponentRegistry
+from src.metrics import stage_timer
+from src.jd_filters import normalize_metadata_value, city_of, CANDIDATE_FILTER_FIELDS
 from config import get_logger, CONFIG_DATA
-from utils.save_to_db import save_to_postgresql
-from utils.gender_classifier import GenderClassifier
-from utils.resume_validator_and_processor import ResumeProcessor
+from utils.save_to_db import save_to_postgresql, save_many_to_postgresql
 
 
 logger = get_logger("MainModule")
 
-login(CONFIG_DATA['hf']['token'])
+# Runs gender classification in the background of the retrieval step. A single worker on purpose:
+# the classifier's pipeline shares one fast tokenizer, which raises "Already borrowed" when two
+# threads set its truncation at once, and the model is small next to the LLM extraction that
+# dominates a request, so queued annotations still finish while other requests are extracting.
+annotation_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
 
 
 current_dir = os.path.abspath(__file__)
@@ -31,23 +33,160 @@ path_to_test_resume = os.path.join(base_path, CONFIG_DATA['data_path']['path_to_
 path_to_train_csv = os.path.join(base_path, CONFIG_DATA['data_path']['path_to_train_csv'])
 path_to_test_csv = os.path.join(base_path, CONFIG_DATA['data_path']['path_to_test_csv'])
 
-md = MarkItDown()
-reader = DOC_READER(md)
-llm = LLM()
-gender_classifier = GenderClassifier()
-validator = ResumeProcessor(llm)
-chroma_client, collection = setup_chromadb(
-    CONFIG_DATA['chroma']['chroma_db_storage_path'], CONFIG_DATA['chroma']['collection_name']
-)
 
-def add_jd_collection(jd_path="JD_data.csv"):
+# Heavy dependencies are imported inside the factories, so importing this module stays cheap
+# and a process only pays for the models it actually uses.
+def _build_reader():
+    from markitdown import MarkItDown
+    from src.reader import DOC_READER
+    return DOC_READER(MarkItDown())
+
+
+def _build_llm():
+    from huggingface_hub import login
+    from src.llm_caller import LLM
+    login(CONFIG_DATA['hf']['token'])
+    return LLM(**CONFIG_DATA.get('llm', {}))
+
+
+def _build_validator():
+    from utils.resume_validator_and_processor import ResumeProcessor
+    return ResumeProcessor(components.get("llm"))
+
+
+def _build_gender_classifier():
+    from utils.gender_classifier import GenderClassifier
+    return GenderClassifier()
+
+
+def _build_chroma():
+    from src.chroma import setup_chromadb
+    embedding_config = dict(CONFIG_DATA.get('embedding', {}))
+    if embedding_config.get('cache_dir'):
+        embedding_config['cache_dir'] = os.path.join(base_path, embedding_config['cache_dir'])
+    if embedding_config.get('onnx', {}).get('onnx_dir'):
+        embedding_config['onnx'] = {
+            **embedding_config['onnx'], 'onnx_dir': os.path.join(base_path, embedding_config['onnx']['onnx_dir'])
+        }
+    return setup_chromadb(
+        CONFIG_DATA['chroma']['chroma_db_storage_path'], CONFIG_DATA['chroma']['collection_name'], embedding_config,
+        CONFIG_DATA.get('retrieval', {})
+    )
+
+
+def _build_resume_index():
+    # Shares the client (and embedding model) of the JD collection
+    chroma_client, _ = components.get("chroma")
+    collection = chroma_client.get_or_create_collection(
+        CONFIG_DATA['chroma'].get('resume_collection_name', 'resume_collection')
+    )
+    return chroma_client, collection
+
+
+def _build_extraction_cache():
+    from src.llm_caller import LLM
+    from utils.extraction_cache import ExtractionCache
+    cache_config = CONFIG_DATA.get('cache', {})
+    return ExtractionCache(
+        os.path.join(base_path, cache_config.get('path', 'data/cache/extraction.sqlite')),
+        model_name=CONFIG_DATA.get('llm', {}).get('model_name', "Qwen/Qwen2.5-7B-Instruct"),
+        # Validated results depend on the routing mode as well as on the prompts
+        prompt_version=f"{LLM.PROMPT_VERSION}:{CONFIG_DATA.get('llm', {}).get('extraction_mode', 'auto')}",
+        max_size_mb=cache_config.get('max_size_mb', 512)
+    )
+
+
+components = ComponentRegistry()
+components.register("reader", _build_reader)
+components.register("llm", _build_llm)
+components.register("validator", _build_validator)
+components.register("gender_classifier", _build_gender_classifier)
+components.register("chroma", _build_chroma)
+components.register("resume_index", _build_resume_index)
+components.register("extraction_cache", _build_extraction_cache)
+
+
+def warm_up(names=None):
+    """Load components ahead of the first request. Loads everything when names is None."""
+    return components.warm_up(names)
+
+
+def jd_description_text(description):
+    """
+    The full description text. The JD CSV stores descriptions as list literals ("['...', '...']"),
+    which are parsed and joined; plain strings and lists are used as they are, missing values become "".
+    """
+    if isinstance(description, str) and description.lstrip().startswith('['):
+        try:
+            description = ast.literal_eval(description)
+        except (ValueError, SyntaxError):
+            return description
+    if isinstance(description, (list, tuple)):
+        return "\n".join(str(part) for part in description if part)
+    if description is None or (isinstance(description, float) and description != description):
+        return ""
+    return str(description)
+
+
+def jd_page_content(job, position, location, description):
+    return f"Job: {job}\nPosition: {position}\nLocation: {location}\nJob Description: {jd_description_text(description)}"
+
+
+def jd_metadata(job, position, location):
+    """JD attributes stored next to the vector, so queries can filter on them in the index."""
+    return {
+        'job': normalize_metadata_value(job),
+        'position': normalize_metadata_value(position),
+        'location': normalize_metadata_value(location),
+        'city': city_of(location),
+    }
+
+
+def iter_jd_batches(csv_path, csv_chunk_size=5000, batch_size=256):
+    """Read a job description CSV in chunks and yield fixed-size batches of documents."""
+    batch = []
+    for df in pd.read_csv(csv_path, chunksize=csv_chunk_size):
+        for index, job, position, location, description in zip(
+            df.index, df['job'], df['position'], df['location'], df['description']
+        ):
+            batch.append({
+                'page_content': jd_page_content(job, position, location, description),
+                'metadata': jd_metadata(job, position, location),
+                'idx': index
+            })
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def add_jd_collection(jd_path="JD_data.csv", stream=None):
     """Add job descriptions to the ChromaDB collection."""
+    chroma_client, collection = components.get("chroma")
+    ingestion_config = CONFIG_DATA.get('ingestion', {})
+    if stream is None:
+        stream = ingestion_config.get('stream', False)
+
+    if stream:
+        batch_size = min(ingestion_config.get('batch_size', 256), chroma_client.max_batch_size())
+        total = chroma_client.stream_to_collection(
+            collection,
+            iter_jd_batches(
+                os.path.join(path_to_jd, jd_path),
+                csv_chunk_size=ingestion_config.get('csv_chunk_size', 5000),
+                batch_size=batch_size
+            )
+        )
+        return f"Successfully saved {total} job descriptions to collection: {collection.name}"
+
     df = pd.read_csv(os.path.join(path_to_jd, jd_path))
     data = []
 
     for index, row in df.iterrows():
         value = {
-            'page_content': f"Job: {row['job']}\nPosition: {row['position']}\nLocation: {row['location']}\nJob Description: {row['description'][0]}",
+            'page_content': jd_page_content(row['job'], row['position'], row['location'], row['description']),
+            'metadata': jd_metadata(row['job'], row['position'], row['location']),
             'idx': index
         }
         data.append(value)
@@ -56,36 +195,206 @@ def add_jd_collection(jd_path="JD_data.csv"):
     return f"Successfully saved to collection: {collection.name}"
     
 
-def add_collection(file_path):
-    """Add resumes to the ChromaDB collection."""
-    data = []
-    for file in os.listdir(file_path):
-        result = reader.doc_markdown(os.path.join(file_path, file))
-        result['page_content'] = result
-        data.append(result)
+def resume_page_content(data):
+    """
+    The text of a validated extraction that is embedded, both as the query for job descriptions
+    and as the document of the resume index, so the two directions share cached embeddings.
+    """
+    return json.dumps(data, default=str)
 
-    chroma_client.add_to_collection(collection=collection, docs=data)
-    logger.info(f"Successfully added {file_path} to chroma database")
 
-    return "Success"
+def resume_metadata(resume_path, data):
+    """Key fields of a validated extraction, stored next to its vector in the resume index."""
+    basics = data.get('basics') or {}
+    location = basics.get('location') or {}
+    skills = [skill.get('name') if isinstance(skill, dict) else skill for skill in data.get('skills') or []]
+    return {
+        'resume_path': resume_path,
+        'name': basics.get('name') or "",
+        'email': basics.get('email') or "",
+        'label': basics.get('label') or "",
+        'location': normalize_metadata_value(location.get('city')),
+        'city': city_of(location.get('city')),
+        'skills': ", ".join(str(skill) for skill in skills if skill),
+    }
 
-def retrieve(resume_path, top_k=2):
-    """Retrieve the most relevant job descriptions for a given resume."""
-    text = reader.doc_markdown(resume_path)
-    print(text)
-    result = llm(text)  
-    # breakpoint()
-    
-    result, flag = validator.validate_and_process(text, result)
+
+def resume_id(resume_path):
+    """Resumes are indexed under the hash of the file, so a re-added or renamed file is not stored twice."""
+    return f"resume_{components.get('extraction_cache').content_hash(resume_path)}"
+
+
+def add_resume_collection(extracted):
+    """
+    Add validated resumes to the resume index. `extracted` maps resume paths to (markdown text,
+    validated data); resumes already in the index are skipped. Returns the number of resumes added.
+    """
+    if not extracted:
+        return 0
+    chroma_client, collection = components.get("resume_index")
+    resume_paths = list(extracted)
+    docs = [
+        {'page_content': resume_page_content(extracted[path][1]), 'metadata': resume_metadata(path, extracted[path][1])}
+        for path in resume_paths
+    ]
+    with stage_timer("resume_index", items=len(docs)):
+        return chroma_client.add_to_collection(collection, docs, ids=[resume_id(path) for path in resume_paths])
+
+
+def add_collection(file_path, max_workers=8, batch_size=64):
+    """
+    Add a folder of resumes to the resume index. Files already indexed are skipped before
+    extraction, so re-running on a growing folder only processes the new resumes.
+    """
+    _, collection = components.get("resume_index")
+    resume_files = [os.path.join(file_path, file) for file in sorted(os.listdir(file_path)) if file.endswith('.pdf')]
+    ids = {path: resume_id(path) for path in resume_files}
+    indexed = set(collection.get(ids=list(ids.values()), include=[])["ids"]) if ids else set()
+    pending = [path for path in resume_files if ids[path] not in indexed]
+    logger.info(f"{len(resume_files) - len(pending)} of {len(resume_files)} resumes in {file_path} are already indexed")
+
+    added = 0
+    extracted = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_resume = {executor.submit(extract_resume, path): path for path in pending}
+        for future in concurrent.futures.as_completed(future_to_resume):
+            resume_path = future_to_resume[future]
+            try:
+                text, result, flag = future.result()
+            except Exception as e:
+                logger.error(f"Error extracting {resume_path}: {e}")
+                continue
+            if flag == False:
+                logger.error(result)
+                continue
+            extracted[resume_path] = (text, result)
+            # Flush in batches, so an interrupted run keeps what it indexed
+            if len(extracted) == batch_size:
+                added += add_resume_collection(extracted)
+                extracted = {}
+    added += add_resume_collection(extracted)
+    logger.info(f"Successfully added {added} resumes from {file_path} to collection: {collection.name}")
+
+    return added
+
+def report_progress(progress, stage):
+    if progress is not None:
+        progress(stage)
+
+
+def parse_resume(resume_path):
+    """Convert a resume to markdown. Used as the process pool task of the folder pipeline."""
+    return components.get("reader").doc_markdown(resume_path)
+
+
+def cached_markdown(resume_path):
+    """Return the cached markdown of a resume, or None if it has not been parsed before."""
+    extraction_cache = components.get("extraction_cache")
+    return extraction_cache.get(extraction_cache.content_hash(resume_path), "markdown")
+
+
+def extract_resume(resume_path, progress=None, text=None):
+    """
+    Parse, summarize, extract and validate a resume, reusing every cached layer for a file already seen.
+    Pass `text` when the markdown has already been produced elsewhere.
+    Returns the markdown text, the validated data (or an error message) and the validation flag.
+    """
+    extraction_cache = components.get("extraction_cache")
+    content_hash = extraction_cache.content_hash(resume_path)
+
+    if text is not None:
+        extraction_cache.put(content_hash, "markdown", text)
+    else:
+        text = extraction_cache.get(content_hash, "markdown")
+    if text is None:
+        report_progress(progress, "parsing")
+        with stage_timer("parse"):
+            text = components.get("reader").doc_markdown(resume_path)
+        extraction_cache.put(content_hash, "markdown", text)
+
+    result = extraction_cache.get(content_hash, "validated")
+    if result is not None:
+        logger.info(f"Extraction cache hit for {resume_path}")
+        return text, result, True
+
+    llm = components.get("llm")
+    if llm.choose_path(text) == "single_pass":
+        # Short resumes fit into one extraction chunk and skip the summarizer
+        summary = text
+    else:
+        summary = extraction_cache.get(content_hash, "summary")
+        if summary is None:
+            report_progress(progress, "summarizing")
+            with stage_timer("summarize"):
+                summary = llm.summarize(text)
+            extraction_cache.put(content_hash, "summary", summary)
+
+    report_progress(progress, "extracting")
+    with stage_timer("extract"):
+        result = llm.extract(summary)
+    report_progress(progress, "validating")
+    with stage_timer("validate"):
+        result, flag = components.get("validator").validate_and_process(text, result)
+    if flag:
+        extraction_cache.put(content_hash, "validated", result)
+    return text, result, flag
+
+
+class ResumeValidationError(ValueError):
+    """Raised by retrieve(..., raise_on_invalid=True) when the extraction of a resume does not validate."""
+
+
+def retrieve(resume_path, top_k=2, progress=None, filters=None, raise_on_invalid=False):
+    """
+    Retrieve the most relevant job descriptions for a given resume.
+    `filters` maps JD attributes (job, position, location) to a value or a list of accepted values.
+    When the extraction does not validate, the validation message is returned, or raised as a
+    ResumeValidationError with raise_on_invalid=True.
+    """
+    text, result, flag = extract_resume(resume_path, progress=progress)
     if flag == False:
         logger.error(result)
+        if raise_on_invalid:
+            raise ResumeValidationError(result)
         print(result)
         return result 
 
-    results = chroma_client.query_collection(collection, json.dumps(result), resume_path, top_k=top_k)
-    gender = gender_classifier(text)
-    breakpoint()
-    results["basics"]["gender"] = gender
+    # Gender classification only needs the text, so it runs while the index is queried
+    gender = annotation_executor.submit(classify_genders, [text])
+
+    report_progress(progress, "querying")
+    chroma_client, collection = components.get("chroma")
+    results = chroma_client.query_collection(
+        collection, resume_page_content(result), resume_path, top_k=top_k, filters=filters
+    )
+    try:
+        gender = gender.result()[0]
+    except Exception as e:
+        logger.error(f"Error classifying gender of {resume_path}: {e}")
+        gender = "Unknown"
+
+    report_progress(progress, "saving")
+    return finalize_matches(resume_path, text, results, gender=gender)
+
+
+def classify_genders(texts):
+    """Classify the candidates' gender of many resumes in batched model calls."""
+    with stage_timer("gender_classification", items=len(texts)):
+        return components.get("gender_classifier").classify_batch(texts)
+
+
+def annotate_matches(text, results, gender=None):
+    """Attach the candidate's gender to the matched job descriptions."""
+    if gender is None:
+        gender = classify_genders([text])[0]
+    for doc in results:
+        doc["gender"] = gender
+    return results
+
+
+def finalize_matches(resume_path, text, results, gender=None):
+    """Annotate and save the matched job descriptions of one resume."""
+    annotate_matches(text, results, gender=gender)
     save_to_postgresql(results)
 
     for doc in results:
@@ -96,6 +405,74 @@ def retrieve(resume_path, top_k=2):
     return results
 
 
+def match_resumes(extracted, top_k=2, filters=None):
+    """
+    Match many already extracted resumes with one batched embedding call and one index search.
+    `extracted` maps resume paths to (markdown text, validated data).
+    """
+    if not extracted:
+        return {}
+
+    resume_paths = list(extracted)
+    genders = annotation_executor.submit(classify_genders, [extracted[path][0] for path in resume_paths])
+
+    queries = [resume_page_content(extracted[path][1]) for path in resume_paths]
+    chroma_client, collection = components.get("chroma")
+    batch_results = chroma_client.query_collection_batch(collection, queries, resume_paths, top_k=top_k, filters=filters)
+
+    if CONFIG_DATA.get('resume_index', {}).get('index_on_match', False):
+        # The resume embeddings were just computed for the query, so with the embedding cache this is a lookup
+        try:
+            add_resume_collection(extracted)
+        except Exception as e:
+            logger.error(f"Error adding matched resumes to the resume index: {e}")
+
+    try:
+        genders = genders.result()
+    except Exception as e:
+        logger.error(f"Error classifying genders: {e}")
+        genders = ["Unknown"] * len(resume_paths)
+
+    results = {}
+    for resume_path, matches, gender in zip(resume_paths, batch_results, genders):
+        try:
+            results[resume_path] = annotate_matches(extracted[resume_path][0], matches, gender=gender)
+        except Exception as e:
+            logger.error(f"Error annotating results for {resume_path}: {e}")
+            results[resume_path] = None
+    return results
+
+
+def retrieve_batch(extracted, top_k=2, filters=None):
+    """
+    Match many already extracted resumes and save all of their results in a single flush.
+    """
+    results = match_resumes(extracted, top_k=top_k, filters=filters)
+    save_many_to_postgresql([matches for matches in results.values() if matches])
+    logger.info(f"Retrieval of most relevant job descriptions for {len(results)} resumes")
+    return results
+
+
+def match_candidates(job_descriptions, top_k=10, filters=None):
+    """
+    The reverse of match_resumes: rank the indexed resumes for each job description text, with
+    one batched embedding call and one index search. `filters` restricts the candidates by their
+    metadata (location). Returns one ranked list per job description; every result carries the
+    candidate's resume_path and key fields in its metadata.
+    """
+    if not job_descriptions:
+        return []
+    chroma_client, collection = components.get("resume_index")
+    batch_results = chroma_client.query_collection_batch(
+        collection, job_descriptions, [None] * len(job_descriptions), top_k=top_k, filters=filters,
+        filter_fields=CANDIDATE_FILTER_FIELDS
+    )
+    for results in batch_results:
+        for doc in results:
+            doc['resume_path'] = doc['metadata'].get('resume_path')
+    return batch_results
+
+
 def process_resume(resume_path, top_k=2):
     """Wrapper function to process a single resume."""
     try:
@@ -105,8 +482,8 @@ def process_resume(resume_path, top_k=2):
         logger.error(f"Error processing {resume_path}: {e}")
         return {resume_path: None}
 
-def process_resumes_in_parallel(resume_paths, top_k=2, max_workers=2):
-    """Process multiple resumes in parallel."""
+def process_resumes_in_parallel(resume_paths, top_k=2, max_workers=8):
+    """Process multiple resumes in parallel. Concurrent resumes share LLM batches, so keep max_workers >= max_batch_size."""
     resume_files = []
     for files in os.listdir(resume_paths):
         if '.pdf' in files:
@@ -117,25 +494,72 @@ def process_resumes_in_parallel(resume_paths, top_k=2, max_workers=2):
         raise ValueError("No resume files provided. Please ensure the list of resumes is not empty.")
 
     results = {}
+    extracted = {}
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_resume = {executor.submit(process_resume, path, top_k): path for path in resume_files}
+        future_to_resume = {executor.submit(extract_resume, path): path for path in resume_files}
         for future in concurrent.futures.as_completed(future_to_resume):
             resume_path = future_to_resume[future]
             try:
-                result = future.result()
-                results.update(result)
+                text, result, flag = future.result()
             except Exception as e:
                 logger.error(f"Error retrieving results for {resume_path}: {e}")
+                results[resume_path] = None
+                continue
+
+            if flag == False:
+                logger.error(result)
+                results[resume_path] = result
+                continue
+            extracted[resume_path] = (text, result)
 
+    # All validated resumes go through the vectorized query path together
+    results.update(retrieve_batch(extracted, top_k=top_k))
     return results
 
 
+def process_resume_folder(resume_paths, top_k=2, parse_workers=None):
+    """
+    Process a folder of resumes through the staged pipeline: a process pool converts PDFs to markdown,
+    the inference stage extracts and validates, matching runs in batches and results are written by an
+    asynchronous DB sink. Returns the per-resume results and the per-stage throughput report.
+    """
+    from src.pipeline import ResumePipeline
+
+    resume_files = [os.path.join(resume_paths, file) for file in sorted(os.listdir(resume_paths)) if file.endswith('.pdf')]
+    if not resume_files:
+        logger.error('File not found')
+        raise ValueError("No resume files provided. Please ensure the list of resumes is not empty.")
+
+    pipeline_config = CONFIG_DATA.get('pipeline', {})
+    pipeline = ResumePipeline(
+        parse_fn=parse_resume,
+        lookup_fn=cached_markdown,
+        extract_fn=lambda path, text: extract_resume(path, text=text)[1:],
+        match_fn=lambda extracted: match_resumes(extracted, top_k=top_k),
+        sink_fn=save_many_to_postgresql,
+        parse_workers=parse_workers or pipeline_config.get('parse_workers', os.cpu_count()),
+        # Several inference threads keep the shared generation engine's batches full
+        inference_workers=pipeline_config.get('inference_workers', CONFIG_DATA.get('llm', {}).get('max_batch_size', 1)),
+        queue_size=pipeline_config.get('queue_size', 16),
+        match_batch_size=pipeline_config.get('match_batch_size', 32),
+        sink_batch_size=pipeline_config.get('sink_batch_size', 64)
+    )
+    return pipeline.run(resume_files)
+
+
+logger.info(f"Imported main in {time.perf_counter() - _import_start:.2f}s")
+
+
 if __name__ == "__main__":
     # resume_paths = os.path.join(f"{base_path}/data/dataset/test_resumes")
     # top_k_results = process_resumes_in_parallel(resume_paths, top_k=2, max_workers=os.cpu_count())
     # print(top_k_results)
 
-    # result = add_collection(path_to_train_resume)
+    # results, stage_report = process_resume_folder(path_to_test_resume, top_k=2)
+    # print(stage_report)
+
+    # added = add_collection(path_to_train_resume)
+    # candidates = match_candidates([jd_page_content("Data Scientist", "Senior", "Zurich", ["Python, NLP"])], top_k=5)
 
     # Retrieve example
     resume_path = 'candidate_001.pdf'
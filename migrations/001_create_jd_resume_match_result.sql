@@ -0,0 +1,22 @@
+-- Match results written by utils/save_to_db.py: one row per (resume, matched job description).
+CREATE TABLE IF NOT EXISTS jd_resume_match_result (
+    id BIGSERIAL PRIMARY KEY,
+    resume_path TEXT NOT NULL,
+    job_description TEXT NOT NULL,
+    similarity_score REAL,
+    chunk_id TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Look up all matches of a resume in rank order
+CREATE INDEX IF NOT EXISTS idx_match_result_resume_rank
+    ON jd_resume_match_result (resume_path, rank);
+
+-- Look up all resumes matched to a job description
+CREATE INDEX IF NOT EXISTS idx_match_result_chunk_id
+    ON jd_resume_match_result (chunk_id);
+
+-- Best matches first
+CREATE INDEX IF NOT EXISTS idx_match_result_similarity
+    ON jd_resume_match_result (similarity_score DESC);
@@ -0,0 +1,219 @@
+import time
+import queue
+import threading
+import torch
+
+from concurrent.futures import Future
+from transformers import LogitsProcessorList
+
+from config import get_logger
+from src.prefix_cache import PrefixKVCache
+from src.metrics import LLM_TOKENS, LLM_TOKENS_PER_SECOND, QUEUE_DEPTH
+
+logger = get_logger("MainModule")
+
+
+class GenerationRequest:
+    """
+    A single prompt waiting for generation, with the future its caller is blocked on.
+    """
+    def __init__(self, input_ids, max_new_tokens, prefix_key=None, prefix_length=0, logits_processor_factory=None):
+        self.input_ids = list(input_ids)
+        self.max_new_tokens = max_new_tokens
+        self.prefix_key = prefix_key
+        self.prefix_length = prefix_length
+        self.logits_processor_factory = logits_processor_factory
+        self.future = Future()
+
+
+class BatchGenerationEngine:
+    """
+    Gathers pending prompts from every in-flight resume and runs them through the model
+    as left-padded batches. Each decoded output is routed back to its caller's future.
+
+    Prompts submitted with a prefix_key share a constant prefix whose KV cache is computed once
+    and reused, so only the per-chunk suffix is prefilled. Prompts submitted with a
+    logits_processor_factory are decoded under the processor it builds (one per batch).
+
+    With a speculative decoder, prompts are generated one at a time, since assisted generation
+    only supports batch size 1.
+    """
+    def __init__(self, model, tokenizer, max_batch_size=8, max_wait_ms=20, max_new_tokens=512, prefix_caching=True,
+                 speculative_decoder=None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        if speculative_decoder is not None:
+            max_batch_size = 1
+
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_new_tokens = max_new_tokens
+        self.pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        self.prefix_cache = PrefixKVCache(model) if prefix_caching else None
+        self.speculative_decoder = speculative_decoder
+
+        self.requests = queue.Queue()
+        QUEUE_DEPTH.set_function(self.requests.qsize, queue="generation")
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="BatchGenerationEngine", daemon=True)
+        self._worker.start()
+
+    def submit(self, input_ids, max_new_tokens=None, prefix_key=None, prefix_length=0, logits_processor_factory=None):
+        """
+        Queue a tokenized prompt and return a future resolving to the decoded response.
+        The first prefix_length tokens are the constant prefix identified by prefix_key.
+        """
+        if self._stopped.is_set():
+            raise RuntimeError("Generation engine has been stopped.")
+        if self.prefix_cache is None:
+            prefix_key, prefix_length = None, 0
+        request = GenerationRequest(
+            input_ids, max_new_tokens or self.max_new_tokens, prefix_key, prefix_length, logits_processor_factory
+        )
+        self.requests.put(request)
+        return request.future
+
+    def generate(self, prompts, max_new_tokens=None, prefix_key=None, prefix_length=0, logits_processor_factory=None):
+        """
+        Submit several tokenized prompts and block until all of them are decoded.
+        """
+        futures = [
+            self.submit(input_ids, max_new_tokens, prefix_key, prefix_length, logits_processor_factory)
+            for input_ids in prompts
+        ]
+        return [future.result() for future in futures]
+
+    def stop(self):
+        self._stopped.set()
+        self.requests.put(None)
+        self._worker.join()
+
+    def _collect_batch(self):
+        """
+        Block for the first request, then keep collecting until the batch is full or max_wait_ms has passed.
+        """
+        first = self.requests.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                self.requests.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _pad_batch(self, batch):
+        max_length = max(len(request.input_ids) for request in batch)
+        input_ids = torch.full((len(batch), max_length), self.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch), max_length), dtype=torch.long)
+
+        for row, request in enumerate(batch):
+            length = len(request.input_ids)
+            input_ids[row, max_length - length:] = torch.tensor(request.input_ids, dtype=torch.long)
+            attention_mask[row, max_length - length:] = 1
+
+        return input_ids.to(self.model.device), attention_mask.to(self.model.device)
+
+    def _pad_batch_after_prefix(self, batch, prefix_length):
+        """
+        Keep the shared prefix aligned at position 0 and left-pad only the suffixes, i.e. padding sits
+        between prefix and suffix. Position ids are derived from the attention mask, so the masked
+        padding does not shift the suffix positions.
+        """
+        max_suffix = max(len(request.input_ids) - prefix_length for request in batch)
+        prefix = torch.tensor(batch[0].input_ids[:prefix_length], dtype=torch.long)
+        input_ids = torch.full((len(batch), prefix_length + max_suffix), self.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch), prefix_length + max_suffix), dtype=torch.long)
+        input_ids[:, :prefix_length] = prefix
+        attention_mask[:, :prefix_length] = 1
+
+        for row, request in enumerate(batch):
+            suffix = request.input_ids[prefix_length:]
+            input_ids[row, input_ids.size(1) - len(suffix):] = torch.tensor(suffix, dtype=torch.long)
+            attention_mask[row, input_ids.size(1) - len(suffix):] = 1
+
+        return input_ids.to(self.model.device), attention_mask.to(self.model.device)
+
+    def _shared_prefix(self, batch):
+        prefix_key = batch[0].prefix_key
+        if prefix_key is None or any(request.prefix_key != prefix_key for request in batch):
+            return None
+        if prefix_key not in self.prefix_cache:
+            self.prefix_cache.register(prefix_key, batch[0].input_ids[:batch[0].prefix_length])
+        return prefix_key
+
+    def _run_batch(self, batch):
+        generate_kwargs = {}
+        prefix_key = self._shared_prefix(batch) if self.prefix_cache is not None else None
+        if prefix_key is not None:
+            input_ids, attention_mask = self._pad_batch_after_prefix(batch, self.prefix_cache.prefix_length(prefix_key))
+            generate_kwargs["past_key_values"] = self.prefix_cache.build(prefix_key, len(batch))
+        else:
+            input_ids, attention_mask = self._pad_batch(batch)
+        if batch[0].logits_processor_factory is not None:
+            generate_kwargs["logits_processor"] = LogitsProcessorList([batch[0].logits_processor_factory()])
+
+        if self.speculative_decoder is not None:
+            generate_kwargs.update(self.speculative_decoder.generate_kwargs())
+            forwards_before = self.speculative_decoder.forward_counts()
+        start = time.perf_counter()
+
+        with torch.inference_mode():
+            generated_ids = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                max_new_tokens=max(request.max_new_tokens for request in batch),
+                num_beams=1,
+                pad_token_id=self.pad_token_id,
+                **generate_kwargs
+            )
+
+        seconds = time.perf_counter() - start
+        new_tokens = generated_ids[:, input_ids.size(1):]
+        generated_count = int((new_tokens != self.pad_token_id).sum())
+        LLM_TOKENS.inc(sum(len(request.input_ids) for request in batch), direction="in")
+        LLM_TOKENS.inc(generated_count, direction="out")
+        if seconds > 0:
+            LLM_TOKENS_PER_SECOND.observe(generated_count / seconds)
+        if self.speculative_decoder is not None:
+            self.speculative_decoder.record(generated_count, seconds, forwards_before)
+        for request, output_ids in zip(batch, new_tokens):
+            response = self.tokenizer.decode(output_ids[:request.max_new_tokens], skip_special_tokens=True)
+            request.future.set_result(response)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect_batch()
+            if batch is None:
+                break
+
+            # Summarizer and extractor prompts have different prefixes; each group reuses its own cache
+            # and shares one decoding constraint
+            groups = {}
+            for request in batch:
+                groups.setdefault((request.prefix_key, request.logits_processor_factory), []).append(request)
+
+            for group in groups.values():
+                start = time.perf_counter()
+                try:
+                    self._run_batch(group)
+                except Exception as e:
+                    logger.error(f"Batch generation failed: {e}")
+                    for request in group:
+                        if not request.future.done():
+                            request.future.set_exception(e)
+                    continue
+
+                logger.info(f"\nGenerated batch of {len(group)} prompts in {time.perf_counter() - start:.2f}s")
@@ -1,37 +1,136 @@
+import os
 import math
 import json
+import time
 import chromadb
-from FlagEmbedding import FlagModel
+import threading
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
 from chromadb.api.types import EmbeddingFunction
 from config import get_logger
+from src.embedding_cache import EmbeddingCache
+from src.onnx_embedding import load_embedding_model
+from src.metrics import stage_timer
+from src.jd_filters import build_where, FILTER_FIELDS
+from src.sparse_index import BM25Index
+from src.exact_search import ExactSearchIndex, DTYPES
 
 logger = get_logger("MainModule")
 
 
-def setup_chromadb(chroma_db_storage_path, collection_name):
-    chroma_client = ChromaDB(db_path=chroma_db_storage_path)
+def setup_chromadb(chroma_db_storage_path, collection_name, embedding_config=None, retrieval_config=None):
+    embedding_config = embedding_config or {}
+    retrieval_config = retrieval_config or {}
+    model_name = embedding_config.get('model_name', 'BAAI/bge-base-en-v1.5')
+    backend = embedding_config.get('backend', 'flag')
+    embedding_cache = None
+    if embedding_config.get('cache_dir'):
+        embedding_cache = EmbeddingCache(
+            embedding_config['cache_dir'],
+            # Quantized vectors differ slightly, so each backend keeps its own cache
+            model_id=model_name if backend == 'flag' else f"{model_name}-{backend}",
+            memory_size=embedding_config.get('memory_cache_size', 10000)
+        )
+    chroma_client = ChromaDB(
+        db_path=chroma_db_storage_path,
+        embedding_model=CustomEmbedding(
+            model_name,
+            cache=embedding_cache,
+            backend=backend,
+            backend_options=embedding_config.get('onnx')
+        ),
+        hybrid=retrieval_config.get('hybrid', False),
+        hybrid_alpha=retrieval_config.get('alpha', 0.5),
+        candidate_factor=retrieval_config.get('candidate_factor', 4),
+        max_query_terms=retrieval_config.get('max_query_terms', 64),
+        search_backend=retrieval_config.get('backend', 'chroma'),
+        exact_options=retrieval_config.get('exact')
+    )
     collection = chroma_client.get_or_create_collection(collection_name)
 
     return chroma_client, collection
 
 
 class CustomEmbedding(EmbeddingFunction):
-    def __init__(self):
-        self.embedding_model = FlagModel('BAAI/bge-base-en-v1.5', use_fp16=True)
+    def __init__(self, model_name='BAAI/bge-base-en-v1.5', cache=None, backend='flag', backend_options=None):
+        self.model_name = model_name
+        self.cache = cache
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        self._embedding_model = None
+        self._lock = threading.Lock()
+
+    @property
+    def embedding_model(self):
+        """
+        The BGE model is only loaded on the first encode, so opening a collection stays cheap.
+        """
+        if self._embedding_model is None:
+            with self._lock:
+                if self._embedding_model is None:
+                    self._embedding_model = load_embedding_model(self.model_name, self.backend, **self.backend_options)
+        return self._embedding_model
 
     def __call__(self, docs):
+        """
+        Returns a float32 matrix with one row per doc; Chroma accepts it as is, without a list copy.
+        """
         if isinstance(docs[0], str):
-            return self.embedding_model.encode(docs).tolist()
+            with stage_timer("embed", items=len(docs)):
+                if self.cache is None:
+                    return np.asarray(self.embedding_model.encode(docs), dtype=np.float32)
+                return self._cached_encode(docs)
         else:
             raise TypeError("Input to embedding model must be a list of strings.")
 
+    def _cached_encode(self, docs):
+        """
+        Only texts missing from the cache reach the model, each distinct text once.
+        """
+        keys = [self.cache.key(doc) for doc in docs]
+        vectors = self.cache.get_many(keys)
+
+        missing = {}
+        for key, doc, vector in zip(keys, docs, vectors):
+            if vector is None and key not in missing:
+                missing[key] = doc
+        if missing:
+            encoded = np.asarray(self.embedding_model.encode(list(missing.values())), dtype=np.float32)
+            self.cache.put_many(list(missing), encoded)
+            encoded_by_key = dict(zip(missing, encoded))
+            vectors = [encoded_by_key[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+        return np.stack(vectors)
+
 
 class ChromaDB:
-    def __init__(self, db_path, distance_method = "cosine"):
+    """
+    With hybrid=True every collection also gets a BM25 index (src/sparse_index.py) stored next to the
+    Chroma data, and queries rank the union of the dense and lexical candidates by
+    hybrid_alpha * similarity + (1 - hybrid_alpha) * normalized BM25 score.
+
+    search_backend="exact" answers the dense part of queries from a memory-mapped copy of the
+    collection's embeddings (src/exact_search.py) instead of the HNSW index; results have the same form.
+    """
+    def __init__(self, db_path, distance_method = "cosine", embedding_model=None,
+                 hybrid=False, hybrid_alpha=0.5, candidate_factor=4, max_query_terms=64,
+                 search_backend="chroma", exact_options=None):
+        if search_backend not in ("chroma", "exact"):
+            raise ValueError(f"Unknown search backend: {search_backend}. Available: ['chroma', 'exact']")
         self.db_path = db_path
         self.client = self.create_connection()
-        self.embedding_model = CustomEmbedding()
+        self.embedding_model = embedding_model or CustomEmbedding()
         self.distance_method = distance_method
+        self.hybrid = hybrid
+        self.hybrid_alpha = hybrid_alpha
+        self.candidate_factor = candidate_factor
+        self.max_query_terms = max_query_terms
+        self.search_backend = search_backend
+        self.exact_options = exact_options or {}
+        self.sparse_indexes = {}
+        self.exact_indexes = {}
+        self._index_lock = threading.Lock()
 
     def create_connection(self):
         client = chromadb.PersistentClient(path=self.db_path)
@@ -40,7 +139,7 @@ class ChromaDB:
     def create_collection(self, project_id):
         collection = self.client.create_collection(
             name=project_id,
-            embedding_function=CustomEmbedding()
+            embedding_function=self.embedding_model
         )
         
         logger.info(f"\nCreate Collection:\n {collection.get().get('ids')}")
@@ -49,7 +148,7 @@ class ChromaDB:
     def get_collection(self, project_id):
         collection = self.client.get_collection(
             name=project_id,
-            embedding_function=CustomEmbedding()
+            embedding_function=self.embedding_model
         )
         
         logger.info(f"\nGet Collection:\n {collection.get().get('ids')}")
@@ -58,47 +157,172 @@ class ChromaDB:
     def get_or_create_collection(self, project_id):
         collection = self.client.get_or_create_collection(
             name=project_id,
-            embedding_function=CustomEmbedding()
+            embedding_function=self.embedding_model
         )
         
         logger.info(f"\nGet or Create Collection:\n {collection.get().get('ids')}")
         return collection
 
-    def add_to_collection(self, collection, docs):
+    def max_batch_size(self):
+        return self.client.get_max_batch_size()
+
+    def sparse_index_path(self, collection_name):
+        return os.path.join(self.db_path, f"bm25_{collection_name}.npz")
+
+    def sparse_index(self, collection):
+        """
+        The BM25 index of a collection, loaded on first use. Collections filled before hybrid
+        retrieval was enabled are indexed from their stored documents once.
+        """
+        with self._index_lock:
+            index = self.sparse_indexes.get(collection.name)
+            if index is None:
+                index = BM25Index(self.sparse_index_path(collection.name), max_query_terms=self.max_query_terms)
+                if len(index) < collection.count():
+                    stored = collection.get(include=["documents"])
+                    index.add(stored["ids"], stored["documents"])
+                    logger.info(f"Built BM25 index of {len(index)} documents for {collection.name}")
+                self.sparse_indexes[collection.name] = index
+            return index
+
+    def exact_index_path(self, collection_name):
+        return os.path.join(self.db_path, f"exact_{collection_name}")
+
+    def exact_index(self, collection):
+        """
+        The exact search index of a collection, rebuilt when the collection changed since it was written.
+        """
+        with self._index_lock:
+            index = self.exact_indexes.get(collection.name)
+            if index is None:
+                index = ExactSearchIndex(self.exact_index_path(collection.name), **self.exact_options)
+                self.exact_indexes[collection.name] = index
+        return index.ensure(collection)
+
+    def invalidate_exact_index(self, collection):
+        """
+        Mark the collection's exact search index out of date after a write, so the next exact query
+        rebuilds it even when deletes and adds left the count unchanged.
+        """
+        with self._index_lock:
+            index = self.exact_indexes.get(collection.name)
+        if index is not None:
+            index.invalidate()
+
+    @staticmethod
+    def _metadatas(docs):
+        """
+        Metadata of every doc, or None when any doc has none (Chroma rejects empty metadata).
+        """
+        metadatas = [doc.get("metadata") for doc in docs]
+        return metadatas if all(metadatas) else None
+
+    def add_to_collection(self, collection, docs, ids=None):
+        """
+        Embed and store docs. Without ids they are numbered after the documents already stored;
+        with ids, docs whose id is already stored (or repeated) are skipped, so adding the same
+        documents again only embeds the new ones. Returns the number of docs added.
+        """
+        if ids is not None:
+            by_id = dict(zip(ids, docs))
+            stored = set(collection.get(ids=list(by_id), include=[])["ids"]) if by_id else set()
+            ids = [key for key in by_id if key not in stored]
+            docs = [by_id[key] for key in ids]
+            if not docs:
+                return 0
+
         documents = [doc["page_content"] for doc in docs]
+        metadatas = self._metadatas(docs)
 
         embeddings = self.embedding_model(documents)
+        if ids is None:
+            num_docs = collection.count()
+            ids = [f"id_{i + num_docs}" for i in range(len(docs))]
+
+        # Chroma rejects a single add larger than its max batch size
+        step = self.max_batch_size()
+        for start in range(0, len(documents), step):
+            collection.add(
+                documents=documents[start:start + step],
+                embeddings=embeddings[start:start + step],
+                metadatas=metadatas[start:start + step] if metadatas else None,
+                ids=ids[start:start + step]
+            )
+        if self.hybrid:
+            self.sparse_index(collection).add(ids, documents)
+        self.invalidate_exact_index(collection)
+        return len(docs)
+
+    def stream_to_collection(self, collection, doc_batches):
+        """
+        Embed and store an iterable of document batches with bounded memory.
+        The write of one batch runs in the background while the next batch is embedded.
+        """
         num_docs = collection.count()
-        ids = [f"id_{i + num_docs}" for i in range(len(docs))]
+        total = 0
+        pending_write = None
+        start_time = time.perf_counter()
+        sparse_index = self.sparse_index(collection) if self.hybrid else None
 
-        collection.add(
-            documents=documents,
-            embeddings=embeddings,
-            ids=ids
-        )
+        def write(documents, embeddings, metadatas, ids):
+            collection.add(documents=documents, embeddings=embeddings, metadatas=metadatas, ids=ids)
+            if sparse_index is not None:
+                sparse_index.add(ids, documents, commit=False)
 
-    def _calculate_relevance_score(self, distance):
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            for docs in doc_batches:
+                documents = [doc["page_content"] for doc in docs]
+                embeddings = self.embedding_model(documents)
+                ids = [f"id_{i + num_docs + total}" for i in range(len(docs))]
+
+                # At most one write in flight keeps memory bounded to two batches
+                if pending_write is not None:
+                    pending_write.result()
+                pending_write = writer.submit(write, documents, embeddings, self._metadatas(docs), ids)
+
+                total += len(docs)
+                elapsed = time.perf_counter() - start_time
+                logger.info(f"Ingested {total} documents ({total / elapsed:.1f} rows/sec)")
+
+            if pending_write is not None:
+                pending_write.result()
+
+        if sparse_index is not None:
+            sparse_index.commit()
+        self.invalidate_exact_index(collection)
+        return total
+
+    def _similarity(self, distance):
         if self.distance_method == "l2":
-            sim_score = 1.0 - distance / math.sqrt(2)
+            return 1.0 - distance / math.sqrt(2)
         elif self.distance_method == "cosine":
-            sim_score = 1.0 - distance
-        else:
-            sim_score = None
+            return 1.0 - distance
+        return None
+
+    def _calculate_relevance_score(self, distance):
+        sim_score = self._similarity(distance)
         return round(sim_score, 2)
 
-    def query_collection(self, collection, query, resume_path, top_k=2):
-        query_result = collection.query(
-            query_texts=[query],
-            n_results=top_k,
-            # where={"action": filter_by}
-        )
+    @staticmethod
+    def _space(collection):
+        """Distance function of the collection's HNSW index; Chroma defaults to l2."""
+        return (collection.metadata or {}).get("hnsw:space", "l2")
+
+    @staticmethod
+    def _distance(query_embedding, embedding, space):
+        """
+        Distance between two embeddings in the collection's space, as collection.query reports it.
+        """
+        embedding = np.asarray(embedding, dtype=np.float32)
+        if space == "cosine":
+            return 1.0 - float(np.dot(query_embedding, embedding) / (np.linalg.norm(query_embedding) * np.linalg.norm(embedding)))
+        if space == "ip":
+            return 1.0 - float(np.dot(query_embedding, embedding))
+        return float(np.sum((query_embedding - embedding) ** 2))
+
+    def _format_results(self, documents, metadatas, distances, ids, resume_path):
         results = []
-        for result in zip(
-            query_result["documents"][0],
-            query_result["metadatas"][0],
-            query_result["distances"][0],
-            query_result["ids"][0]
-        ):
+        for result in zip(documents, metadatas, distances, ids):
             metadata = result[1] or {}
 
             if "keys" in metadata:
@@ -116,12 +340,140 @@ class ChromaDB:
                 "chunk_id": result[3],
                 "resume_path": resume_path
             })
+        return results
+
+    def query_collection(self, collection, query, resume_path, top_k=2, filters=None, filter_fields=FILTER_FIELDS):
+        results = self.query_collection_batch(
+            collection, [query], [resume_path], top_k=top_k, filters=filters, filter_fields=filter_fields
+        )[0]
 
         logger.info(f"\nQuery Results:\n {results}")
         return results
 
+    def query_collection_batch(self, collection, queries, resume_paths, top_k=2, filters=None, filter_fields=FILTER_FIELDS):
+        """
+        Embed many resume queries in one call and search them with a single collection.query.
+        `filters` (see build_where) restricts the search to matching JDs inside the index;
+        `filter_fields` are the metadata fields of the collection that can be filtered on.
+        Returns one ranked result list per query, in input order.
+        """
+        if len(queries) != len(resume_paths):
+            raise ValueError("queries and resume_paths must have the same length.")
+
+        where = build_where(filters, filter_fields)
+        query_embeddings = self.embedding_model(queries)
+        n_results = top_k * self.candidate_factor if self.hybrid else top_k
+        if self.search_backend == "exact":
+            with stage_timer("exact_query", items=len(queries)):
+                query_result = self._exact_query(collection, query_embeddings, n_results, where)
+        else:
+            with stage_timer("chroma_query", items=len(queries)):
+                query_result = collection.query(
+                    query_embeddings=query_embeddings,
+                    n_results=n_results,
+                    where=where
+                )
+        if self.hybrid:
+            return self._hybrid_rank(collection, queries, query_embeddings, query_result, resume_paths, where, top_k)
+        return [
+            self._format_results(
+                query_result["documents"][i],
+                query_result["metadatas"][i],
+                query_result["distances"][i],
+                query_result["ids"][i],
+                resume_path
+            )
+            for i, resume_path in enumerate(resume_paths)
+        ]
+
+    def _exact_query(self, collection, query_embeddings, n_results, where):
+        """
+        collection.query computed by the exact search index. Chroma still evaluates the where
+        clause and serves the documents and metadata of the hits, in one get each.
+        """
+        index = self.exact_index(collection)
+        allowed_ids = collection.get(where=where, include=[])["ids"] if where else None
+        query_result = index.search(
+            query_embeddings, n_results, space=self._space(collection), allowed_ids=allowed_ids
+        )
+
+        hit_ids = sorted({key for ids in query_result["ids"] for key in ids})
+        stored = collection.get(ids=hit_ids, include=["documents", "metadatas"]) if hit_ids else {"ids": []}
+        by_id = {
+            key: (document, metadata)
+            for key, document, metadata in zip(stored["ids"], stored.get("documents", []), stored.get("metadatas", []))
+        }
+        # Every query gets its own metadata dicts, since _format_results decodes them in place
+        query_result["documents"] = [[by_id[key][0] for key in ids] for ids in query_result["ids"]]
+        query_result["metadatas"] = [
+            [dict(by_id[key][1]) if by_id[key][1] else by_id[key][1] for key in ids] for ids in query_result["ids"]
+        ]
+        return query_result
+
+    def _hybrid_rank(self, collection, queries, query_embeddings, query_result, resume_paths, where, top_k):
+        """
+        Fuse the dense candidates of every query with its BM25 candidates and keep the top_k by
+        hybrid_score. BM25 scores are normalized by the best candidate of the query.
+        """
+        sparse_index = self.sparse_index(collection)
+        with stage_timer("bm25_query", items=len(queries)):
+            searches = [
+                sparse_index.search(query, top_k * self.candidate_factor, score_keys=ids)
+                for query, ids in zip(queries, query_result["ids"])
+            ]
+
+        # Lexical candidates the dense search missed are fetched in one get for all queries;
+        # the where clause drops those that do not pass the filters
+        dense_ids = {key for ids in query_result["ids"] for key in ids}
+        missing = sorted({key for hits, _ in searches for key, _ in hits} - dense_ids)
+        fetched = {}
+        if missing:
+            stored = collection.get(ids=missing, where=where, include=["documents", "metadatas", "embeddings"])
+            fetched = {
+                key: (document, metadata, embedding)
+                for key, document, metadata, embedding
+                in zip(stored["ids"], stored["documents"], stored["metadatas"], stored["embeddings"])
+            }
+        space = self._space(collection)
+
+        ranked = []
+        for i, (resume_path, (hits, bm25_scores)) in enumerate(zip(resume_paths, searches)):
+            documents = list(query_result["documents"][i])
+            metadatas = list(query_result["metadatas"][i])
+            distances = list(query_result["distances"][i])
+            ids = list(query_result["ids"][i])
+            for key, score in hits:
+                bm25_scores[key] = score
+                if key in fetched and key not in ids:
+                    document, metadata, embedding = fetched[key]
+                    documents.append(document)
+                    metadatas.append(dict(metadata) if metadata else metadata)
+                    distances.append(self._distance(query_embeddings[i], embedding, space))
+                    ids.append(key)
+
+            max_bm25 = max(bm25_scores.values(), default=0.0) or 1.0
+            results = self._format_results(documents, metadatas, distances, ids, resume_path)
+            for result, distance in zip(results, distances):
+                bm25_score = bm25_scores.get(result["chunk_id"], 0.0)
+                result["bm25_score"] = round(bm25_score, 4)
+                result["hybrid_score"] = round(
+                    self.hybrid_alpha * self._similarity(distance) + (1 - self.hybrid_alpha) * bm25_score / max_bm25, 4
+                )
+            results.sort(key=lambda result: result["hybrid_score"], reverse=True)
+            ranked.append(results[:top_k])
+        return ranked
+
     def delete_collection(self, collection_name):
         self.client.delete_collection(name=collection_name)
+        with self._index_lock:
+            self.sparse_indexes.pop(collection_name, None)
+            self.exact_indexes.pop(collection_name, None)
+        exact_path = self.exact_index_path(collection_name)
+        paths = [self.sparse_index_path(collection_name)]
+        paths += [path for dtype in DTYPES for path in (f"{exact_path}_{dtype}.npy", f"{exact_path}_{dtype}.ids.json")]
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
 
 
 if __name__ == "__main__":
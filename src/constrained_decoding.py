@@ -0,0 +1,97 @@
+import math
+import torch
+
+from transformers import LogitsProcessor
+
+from src.json_prefix_parser import JsonPrefixParser
+
+
+class JsonSchemaLogitsProcessor(LogitsProcessor):
+    """
+    Masks every token that would make the generated text stop being a prefix of a valid JSON
+    object following top_level_keys, and forces EOS as soon as the outer object closes.
+
+    Only the top_k most likely tokens, selected with torch.topk, are checked against the parser at
+    each step (more if none of them is valid), so the parser work does not grow with the vocabulary.
+    """
+    def __init__(self, tokenizer, eos_token_ids, top_level_keys=None, top_k=32, max_candidates=1024):
+        self.tokenizer = tokenizer
+        self.eos_token_ids = [eos_token_ids] if isinstance(eos_token_ids, int) else list(eos_token_ids)
+        self.top_level_keys = top_level_keys
+        self.top_k = top_k
+        self.max_candidates = max_candidates
+        self.token_text = {}
+        self.prompt_length = None
+        self.rows = None
+
+    def _text(self, token_id):
+        if token_id not in self.token_text:
+            self.token_text[token_id] = self.tokenizer.decode([token_id], skip_special_tokens=False)
+        return self.token_text[token_id]
+
+    def _parser_for(self, row, generated):
+        """
+        Advance the row's parser over newly generated tokens. Rebuilt from scratch if the sequence
+        diverged from what was fed before (e.g. rejected speculative tokens). Returns None once a
+        token was rejected (after an unconstrained step): the parser state no longer matches the
+        text, so the row stays unconstrained for the rest of the sequence.
+        """
+        fed, parser = self.rows[row]
+        if generated[:len(fed)] != fed:
+            fed, parser = [], JsonPrefixParser(self.top_level_keys)
+        if parser is not None:
+            for token_id in generated[len(fed):]:
+                if parser.done:
+                    break
+                if not parser.feed(self._text(token_id)):
+                    parser = None
+                    break
+        self.rows[row] = (generated, parser)
+        return parser
+
+    def _allowed_tokens(self, parser, row_scores):
+        """
+        Valid tokens among the best candidates. Each round takes the next window of candidates
+        from a topk over the tokens checked so far plus the window, never a full vocabulary sort.
+        """
+        checked = 0
+        window = self.top_k
+        limit = min(self.max_candidates, row_scores.size(0))
+        while checked < limit:
+            count = min(checked + window, limit)
+            top = torch.topk(row_scores, count)
+            allowed = []
+            for token_id, score in zip(top.indices[checked:count].tolist(), top.values[checked:count].tolist()):
+                if token_id in self.eos_token_ids or math.isinf(score):
+                    continue
+                text = self._text(token_id)
+                if text and parser.copy().feed(text):
+                    allowed.append(token_id)
+            if allowed:
+                return allowed
+            checked = count
+            window *= 2
+        return None
+
+    def __call__(self, input_ids, scores):
+        if self.rows is None:
+            self.prompt_length = input_ids.shape[1]
+            self.rows = [([], JsonPrefixParser(self.top_level_keys)) for _ in range(input_ids.shape[0])]
+
+        masked = torch.full_like(scores, -math.inf)
+        for row in range(input_ids.shape[0]):
+            parser = self._parser_for(row, input_ids[row, self.prompt_length:].tolist())
+            if parser is None:
+                masked[row] = scores[row]
+                continue
+            if parser.done:
+                masked[row, self.eos_token_ids[0]] = 0.0
+                continue
+
+            allowed = self._allowed_tokens(parser, scores[row])
+            if allowed is None:
+                # Nothing valid among the candidates: leave this step unconstrained
+                masked[row] = scores[row]
+            else:
+                masked[row, allowed] = scores[row, allowed]
+        return masked
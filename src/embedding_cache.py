@@ -0,0 +1,133 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import numpy as np
+
+from collections import OrderedDict
+
+from config import get_logger
+
+logger = get_logger("MainModule")
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of text embeddings keyed on a hash of the model id and the whitespace-normalized text.
+
+    - memory: LRU of float32 vectors, at most memory_size entries
+    - disk: float16 matrix in a memory-mapped file, plus an append-only index file whose
+      n-th line is the key stored in row n
+    """
+    def __init__(self, cache_dir, model_id, memory_size=10000, initial_capacity=4096):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.model_id = model_id
+        self.memory_size = memory_size
+        self.initial_capacity = initial_capacity
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        base_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_id)
+        self.matrix_path = os.path.join(cache_dir, f"{base_name}.f16")
+        self.index_path = os.path.join(cache_dir, f"{base_name}.index")
+        self.meta_path = os.path.join(cache_dir, f"{base_name}.meta.json")
+
+        self.rows = {}
+        self.dim = None
+        self.matrix = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path, 'r') as file:
+            self.dim = json.load(file)["dim"]
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as file:
+                for row, key in enumerate(file):
+                    self.rows[key.strip()] = row
+        self._open_matrix(max(self.initial_capacity, len(self.rows)))
+        logger.info(f"Loaded {len(self.rows)} cached embeddings for {self.model_id}")
+
+    def _open_matrix(self, capacity):
+        """
+        Map the matrix file, growing it on disk to hold at least `capacity` rows.
+        """
+        required_bytes = capacity * self.dim * np.dtype(np.float16).itemsize
+        current_bytes = os.path.getsize(self.matrix_path) if os.path.exists(self.matrix_path) else 0
+        if current_bytes < required_bytes:
+            with open(self.matrix_path, 'ab') as file:
+                file.truncate(required_bytes)
+        capacity = max(capacity, current_bytes // (self.dim * np.dtype(np.float16).itemsize))
+        self.matrix = np.memmap(self.matrix_path, dtype=np.float16, mode='r+', shape=(capacity, self.dim))
+
+    def key(self, text):
+        normalized = " ".join(text.split())
+        return hashlib.sha1(f"{self.model_id}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """
+        Cached vectors for the given keys, None where the key is not cached.
+        """
+        vectors = []
+        with self.lock:
+            for key in keys:
+                vector = self.memory.get(key)
+                if vector is not None:
+                    self.memory.move_to_end(key)
+                    self.hits_memory += 1
+                elif key in self.rows:
+                    vector = np.asarray(self.matrix[self.rows[key]], dtype=np.float32)
+                    self._remember(key, vector)
+                    self.hits_disk += 1
+                else:
+                    self.misses += 1
+                vectors.append(vector)
+        return vectors
+
+    def put_many(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self.lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self.meta_path, 'w') as file:
+                    json.dump({"model_id": self.model_id, "dim": self.dim}, file)
+                self._open_matrix(self.initial_capacity)
+
+            new_keys = []
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+                if key in self.rows:
+                    continue
+                row = len(self.rows)
+                if row >= self.matrix.shape[0]:
+                    self.matrix.flush()
+                    self._open_matrix(self.matrix.shape[0] * 2)
+                self.matrix[row] = vector
+                self.rows[key] = row
+                new_keys.append(key)
+
+            if new_keys:
+                # Rows are flushed before the index points at them
+                self.matrix.flush()
+                with open(self.index_path, 'a') as file:
+                    file.write("".join(f"{key}\n" for key in new_keys))
+
+    def _remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def stats(self):
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "memory_entries": len(self.memory),
+            "disk_entries": len(self.rows),
+        }
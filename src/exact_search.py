@@ -0,0 +1,168 @@
+import os
+import json
+import threading
+import numpy as np
+
+from collections import namedtuple
+
+from config import get_logger
+
+logger = get_logger("MainModule")
+
+DTYPES = {"float32": np.float32, "float16": np.float16}
+# Everything a search reads, swapped in with one assignment so a query never mixes two builds
+Snapshot = namedtuple("Snapshot", ["ids", "rows", "matrix", "norms"])
+EMPTY_SNAPSHOT = Snapshot([], {}, None, None)
+
+
+class ExactSearchIndex:
+    """
+    Brute-force nearest-neighbour search over every embedding of a Chroma collection.
+
+    The embeddings are copied once into a .npy matrix (float32, or float16 for half the memory)
+    that is memory-mapped on load, with the Chroma ids in a JSON file next to it. A block of
+    queries is scored against the whole matrix with one matmul and the top_k are selected with
+    argpartition, so results are exact and a batch costs a few BLAS calls instead of one HNSW
+    walk per query. Distances follow the collection's space, as collection.query reports them.
+    """
+    def __init__(self, path, dtype="float32", block_size=256, chunk_rows=16384):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype: {dtype}. Available: {list(DTYPES)}")
+        self.matrix_path = f"{path}_{dtype}.npy"
+        self.ids_path = f"{path}_{dtype}.ids.json"
+        self.dtype = DTYPES[dtype]
+        self.block_size = block_size
+        # float16 rows are cast to float32 this many at a time before the matmul
+        self.chunk_rows = chunk_rows
+        self.lock = threading.Lock()
+
+        self.snapshot = EMPTY_SNAPSHOT
+        # Set by invalidate() on writes to the collection; the next ensure() rebuilds
+        self.outdated = False
+        # Files of an earlier run are checked against the collection's ids once
+        self.verified = False
+        if os.path.exists(self.matrix_path) and os.path.exists(self.ids_path):
+            self.load()
+
+    def __len__(self):
+        return len(self.snapshot.ids)
+
+    def build(self, collection, page_size=5000):
+        """
+        Copy all embeddings of the collection into the matrix file, page by page, so memory stays
+        bounded to one page. The files are written under temporary names and then swapped in.
+        """
+        count = collection.count()
+        if not count:
+            self.snapshot = EMPTY_SNAPSHOT
+            return
+        dim = len(collection.get(include=["embeddings"], limit=1)["embeddings"][0])
+
+        os.makedirs(os.path.dirname(self.matrix_path) or ".", exist_ok=True)
+        temporary_matrix_path = f"{self.matrix_path}.tmp.npy"
+        matrix = np.lib.format.open_memmap(temporary_matrix_path, mode="w+", dtype=self.dtype, shape=(count, dim))
+        ids = []
+        for offset in range(0, count, page_size):
+            # Bounded by count, so documents added during the build wait for the next one
+            page = collection.get(include=["embeddings"], limit=min(page_size, count - offset), offset=offset)
+            matrix[offset:offset + len(page["ids"])] = np.asarray(page["embeddings"], dtype=np.float32)
+            ids.extend(page["ids"])
+        matrix.flush()
+        del matrix
+
+        temporary_ids_path = f"{self.ids_path}.tmp"
+        with open(temporary_ids_path, "w") as file:
+            json.dump(ids, file)
+        os.replace(temporary_matrix_path, self.matrix_path)
+        os.replace(temporary_ids_path, self.ids_path)
+        logger.info(f"Built exact search index of {len(ids)} embeddings for {collection.name}")
+        self.load()
+
+    def load(self):
+        with open(self.ids_path, "r") as file:
+            ids = json.load(file)
+        # Rows past the ids were never filled, when documents were deleted during the build
+        matrix = np.load(self.matrix_path, mmap_mode="r")[:len(ids)]
+        norms = np.empty(len(ids), dtype=np.float32)
+        for start in range(0, len(ids), self.chunk_rows):
+            norms[start:start + self.chunk_rows] = np.linalg.norm(
+                np.asarray(matrix[start:start + self.chunk_rows], dtype=np.float32), axis=1
+            )
+        self.snapshot = Snapshot(ids, {key: row for row, key in enumerate(ids)}, matrix, norms)
+
+    def invalidate(self):
+        """
+        Mark the matrix out of date after a write to the collection; the next ensure() rebuilds it.
+        """
+        self.outdated = True
+
+    def ensure(self, collection):
+        """
+        Rebuild the matrix when it is out of date: after invalidate(), when the collection changed
+        size (e.g. written by another process), or when files of an earlier run hold other ids.
+        """
+        with self.lock:
+            # Cleared before the rebuild, so a write during it invalidates again
+            outdated, self.outdated = self.outdated, False
+            ids = self.snapshot.ids
+            count = collection.count()
+            outdated = outdated or len(ids) != count or bool(count and self.snapshot.matrix is None)
+            if not outdated and not self.verified and count:
+                outdated = set(collection.get(include=[])["ids"]) != set(ids)
+            if outdated:
+                self.build(collection)
+            self.verified = True
+        return self
+
+    def _dot(self, snapshot, queries):
+        if self.dtype == np.float32:
+            return queries @ snapshot.matrix.T
+        dot = np.empty((len(queries), len(snapshot.ids)), dtype=np.float32)
+        for start in range(0, len(snapshot.ids), self.chunk_rows):
+            chunk = np.asarray(snapshot.matrix[start:start + self.chunk_rows], dtype=np.float32)
+            dot[:, start:start + len(chunk)] = queries @ chunk.T
+        return dot
+
+    def _distances(self, snapshot, queries, space):
+        dot = self._dot(snapshot, queries)
+        if space == "cosine":
+            query_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            return 1.0 - dot / np.maximum(query_norms * snapshot.norms, 1e-12)
+        if space == "ip":
+            return 1.0 - dot
+        squared_norms = np.sum(queries * queries, axis=1, keepdims=True)
+        return np.maximum(squared_norms + snapshot.norms ** 2 - 2.0 * dot, 0.0)
+
+    def search(self, query_embeddings, top_k, space="l2", allowed_ids=None):
+        """
+        The top_k ids and distances of every query, shaped like collection.query's result.
+        allowed_ids restricts the search to those ids, e.g. the JDs matching a where clause.
+        """
+        # One snapshot for the whole search, whatever a concurrent rebuild swaps in meanwhile
+        snapshot = self.snapshot
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        excluded = None
+        if allowed_ids is not None:
+            excluded = np.ones(len(snapshot.ids), dtype=bool)
+            excluded[[snapshot.rows[key] for key in allowed_ids if key in snapshot.rows]] = False
+        k = min(top_k, len(snapshot.ids) if excluded is None else int((~excluded).sum()))
+        if k <= 0:
+            return {"ids": [[] for _ in queries], "distances": [[] for _ in queries]}
+
+        result = {"ids": [], "distances": []}
+        for start in range(0, len(queries), self.block_size):
+            distances = self._distances(snapshot, queries[start:start + self.block_size], space)
+            if excluded is not None:
+                distances[:, excluded] = np.inf
+            if k < distances.shape[1]:
+                top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(distances.shape[1]), distances.shape)
+            top_distances = np.take_along_axis(distances, top, axis=1)
+            order = np.argsort(top_distances, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_distances = np.take_along_axis(top_distances, order, axis=1)
+            for rows, row_distances in zip(top.tolist(), top_distances.tolist()):
+                result["ids"].append([snapshot.ids[row] for row in rows])
+                result["distances"].append(row_distances)
+        return result
@@ -0,0 +1,98 @@
+import torch
+
+from transformers import AutoModelForCausalLM
+
+from config import get_logger
+
+logger = get_logger("MainModule")
+
+
+def load_torch_model(model_name, device):
+    """
+    fp16 weights, compiled. Fast on GPU; on CPU fp16 matmuls are emulated and slow.
+    """
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name,
+        torch_dtype=torch.float16,
+        device_map=device
+    )
+    return torch.compile(model)
+
+
+def load_int8_dynamic_model(model_name, device):
+    """
+    int8 weights with dynamic activation quantization for every nn.Linear (torch built-in, CPU only).
+    The model is loaded in bfloat16 and converted one decoder layer at a time, so peak memory
+    stays close to the bf16 model instead of a full fp32 copy.
+    """
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name,
+        torch_dtype=torch.bfloat16,
+        device_map="cpu",
+        low_cpu_mem_usage=True
+    )
+    model.eval()
+
+    for layer in model.model.layers:
+        layer.float()
+        torch.ao.quantization.quantize_dynamic(layer, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+    # Quantized layers expect fp32 activations, so the remaining modules run in fp32 too
+    model.get_input_embeddings().float()
+    model.model.norm.float()
+    model.get_output_embeddings().float()
+    torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+
+def load_int4_weight_only_model(model_name, device):
+    """
+    int4 weight-only quantization through torchao (optional dependency), compiled.
+    """
+    try:
+        from torchao.quantization import quantize_, int4_weight_only
+    except ImportError:
+        raise ImportError("The int4_weight_only backend needs torchao: `pip install torchao`.")
+
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name,
+        torch_dtype=torch.bfloat16,
+        device_map=device,
+        low_cpu_mem_usage=True
+    )
+    model.eval()
+
+    kwargs = {}
+    if device.type == "cpu":
+        try:
+            from torchao.dtypes import Int4CPULayout
+            kwargs["layout"] = Int4CPULayout()
+        except ImportError:
+            logger.error("This torchao version has no CPU int4 layout; using its default layout.")
+    quantize_(model, int4_weight_only(**kwargs))
+    return torch.compile(model)
+
+
+BACKENDS = {
+    "torch": load_torch_model,
+    "int8_dynamic": load_int8_dynamic_model,
+    "int4_weight_only": load_int4_weight_only_model,
+}
+
+CPU_ONLY_BACKENDS = ("int8_dynamic",)
+
+
+def load_model(model_name, backend="torch", device=None):
+    """
+    Load a causal LM with the given inference backend. All backends return a model with the
+    regular generate() interface, so prompting, chunking and batching are unchanged.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}. Available: {list(BACKENDS)}")
+
+    device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    if backend in CPU_ONLY_BACKENDS:
+        device = torch.device("cpu")
+
+    logger.info(f"Loading {model_name} with the {backend} backend on {device}")
+    return BACKENDS[backend](model_name, device)
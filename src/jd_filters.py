@@ -0,0 +1,47 @@
+import math
+
+# location matches the full stored location ("zurich, switzerland"), city only its first part
+FILTER_FIELDS = ("job", "position", "location", "city")
+# Metadata of the resume index that candidate searches can filter on
+CANDIDATE_FILTER_FIELDS = ("location", "city")
+
+
+def normalize_metadata_value(value):
+    """
+    Metadata values are stored and matched lowercased and stripped, since Chroma filters only
+    support exact matches. Missing values (None, NaN) become an empty string.
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return str(value).strip().lower()
+
+
+def city_of(location):
+    """
+    The city of a location such as "Zurich, Switzerland": the text before the first comma, normalized.
+    """
+    return normalize_metadata_value(location).split(",")[0].strip()
+
+
+def build_where(filters, fields=FILTER_FIELDS):
+    """
+    Translate {"city": "Zurich", "position": ["Senior", "Lead"]} into a Chroma `where` clause.
+    A list accepts any of its values; several fields must all match. `fields` are the allowed keys.
+    """
+    if not filters:
+        return None
+
+    clauses = []
+    for field, value in filters.items():
+        if field not in fields:
+            raise ValueError(f"Unknown filter: {field}. Available: {list(fields)}")
+        if value is None or value == "" or value == []:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            clauses.append({field: {"$in": [normalize_metadata_value(item) for item in value]}})
+        else:
+            clauses.append({field: {"$eq": normalize_metadata_value(value)}})
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
@@ -0,0 +1,111 @@
+import time
+import uuid
+import queue
+import threading
+
+from collections import OrderedDict
+
+from config import get_logger
+
+logger = get_logger("MainModule")
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class Job:
+    def __init__(self, func, args, kwargs):
+        self.id = uuid.uuid4().hex
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = "queued"
+        self.progress = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def set_progress(self, stage):
+        self.progress = stage
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    Bounded in-process worker pool. Jobs wait in a queue of at most max_queue_size entries
+    and are executed by max_workers threads. The job function receives a `progress`
+    callback it can call with the name of its current stage.
+    """
+    def __init__(self, max_workers=2, max_queue_size=32, max_finished_jobs=1000):
+        self.max_queue_size = max_queue_size
+        self.max_finished_jobs = max_finished_jobs
+        self.pending = queue.Queue(maxsize=max_queue_size)
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.workers = [
+            threading.Thread(target=self._run, name=f"JobWorker-{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, func, *args, **kwargs):
+        job = Job(func, args, kwargs)
+        with self.lock:
+            try:
+                self.pending.put_nowait(job)
+            except queue.Full:
+                raise QueueFullError(f"Job queue is full ({self.max_queue_size} jobs waiting), try again later.")
+            self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def depth(self):
+        return self.pending.qsize()
+
+    def _forget_finished_jobs(self):
+        """
+        Keep at most max_finished_jobs finished jobs around for result lookups, oldest dropped first.
+        """
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    def _run(self):
+        while True:
+            job = self.pending.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = job.func(*job.args, progress=job.set_progress, **job.kwargs)
+                job.status = "done"
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}")
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                with self.lock:
+                    self._forget_finished_jobs()
+                self.pending.task_done()
@@ -0,0 +1,223 @@
+import typing
+
+from pydantic import BaseModel
+
+LITERALS = {"t": "rue", "f": "alse", "n": "ull"}
+DIGITS = set("0123456789")
+# JSON number grammar: -?(0|[1-9][0-9]*)(.[0-9]+)?([eE][+-]?[0-9]+)?, as transitions of
+# (state, character class) -> state; a number may only end in one of NUMBER_END_STATES
+NUMBER_TRANSITIONS = {
+    ("minus", "0"): "zero", ("minus", "1-9"): "integer",
+    ("integer", "0"): "integer", ("integer", "1-9"): "integer", ("integer", "."): "point", ("integer", "e"): "exponent",
+    ("zero", "."): "point", ("zero", "e"): "exponent",
+    ("point", "0"): "fraction", ("point", "1-9"): "fraction",
+    ("fraction", "0"): "fraction", ("fraction", "1-9"): "fraction", ("fraction", "e"): "exponent",
+    ("exponent", "+-"): "exponent_sign", ("exponent", "0"): "exponent_digits", ("exponent", "1-9"): "exponent_digits",
+    ("exponent_sign", "0"): "exponent_digits", ("exponent_sign", "1-9"): "exponent_digits",
+    ("exponent_digits", "0"): "exponent_digits", ("exponent_digits", "1-9"): "exponent_digits",
+}
+NUMBER_END_STATES = {"zero", "integer", "fraction", "exponent_digits"}
+HEX_DIGITS = set("0123456789abcdefABCDEF")
+ESCAPES = set('"\\/bfnrt')
+
+
+def _container_of(annotation):
+    """
+    '{' for a model, '[' for a list, None for anything else, looking through Optional/Union.
+    """
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        containers = {_container_of(arg) for arg in typing.get_args(annotation) if arg is not type(None)}
+        return containers.pop() if len(containers) == 1 else None
+    if origin in (list, typing.List):
+        return "["
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return "{"
+    return None
+
+
+def top_level_schema(model, keys=None):
+    """
+    Map the model's field names (or the given subset) to the container their value must open with.
+    """
+    return {
+        name: _container_of(field.annotation)
+        for name, field in model.model_fields.items()
+        if keys is None or name in keys
+    }
+
+
+def _number_char_class(char):
+    if char == "0":
+        return "0"
+    if char in DIGITS:
+        return "1-9"
+    if char in "eE":
+        return "e"
+    if char in "+-":
+        return "+-"
+    return char
+
+
+class JsonPrefixParser:
+    """
+    Incremental character-level JSON parser that accepts any prefix of a valid JSON object.
+    With top_level_keys, keys of the outer object must be one of its keys and their values must
+    open with the mapped container.
+    """
+    def __init__(self, top_level_keys=None):
+        self.top_level_keys = top_level_keys
+        self.stack = []
+        self.mode = "start"
+        self.is_key = False
+        self.escape = False
+        self.unicode_left = 0
+        self.literal = ""
+        self.number = None
+        self.key = ""
+        self.expected_container = None
+
+    def copy(self):
+        parser = object.__new__(JsonPrefixParser)
+        parser.__dict__.update(self.__dict__)
+        parser.stack = list(self.stack)
+        return parser
+
+    @property
+    def done(self):
+        return self.mode == "done"
+
+    def feed(self, text):
+        for char in text:
+            if not self._feed_char(char):
+                return False
+        return True
+
+    def _checking_keys(self):
+        return self.top_level_keys is not None and len(self.stack) == 1
+
+    def _close_value(self):
+        self.mode = "comma_or_close" if self.stack else "done"
+
+    def _start_value(self, char):
+        expected, self.expected_container = self.expected_container, None
+        if expected and char != expected:
+            return False
+
+        if char == "{":
+            self.stack.append("o")
+            self.mode = "key_or_close"
+        elif char == "[":
+            self.stack.append("a")
+            self.mode = "value_or_close"
+        elif char == '"':
+            self.mode = "string"
+            self.is_key = False
+        elif char in "-0123456789":
+            self.mode = "number"
+            self.number = {"-": "minus", "0": "zero"}.get(char, "integer")
+        elif char in LITERALS:
+            self.mode = "literal"
+            self.literal = LITERALS[char]
+        else:
+            return False
+        return True
+
+    def _feed_string_char(self, char):
+        if self.unicode_left:
+            self.unicode_left -= 1
+            return char in HEX_DIGITS
+        if self.escape:
+            self.escape = False
+            if char == "u":
+                self.unicode_left = 4
+                return True
+            return char in ESCAPES
+        if char == '"':
+            if not self.is_key:
+                self._close_value()
+            elif self._checking_keys() and self.key not in self.top_level_keys:
+                return False
+            else:
+                self.mode = "colon"
+            return True
+        if ord(char) < 0x20:
+            return False
+        if self.is_key and self._checking_keys():
+            if char == "\\":
+                return False
+            key = self.key + char
+            if not any(allowed.startswith(key) for allowed in self.top_level_keys):
+                return False
+            self.key = key
+            return True
+        if char == "\\":
+            self.escape = True
+        return True
+
+    def _feed_char(self, char):
+        mode = self.mode
+        if mode == "string":
+            return self._feed_string_char(char)
+        if mode == "number":
+            state = NUMBER_TRANSITIONS.get((self.number, _number_char_class(char)))
+            if state is not None:
+                self.number = state
+                return True
+            if self.number not in NUMBER_END_STATES:
+                return False
+            self._close_value()
+            return self._feed_char(char)
+        if mode == "literal":
+            if char != self.literal[0]:
+                return False
+            self.literal = self.literal[1:]
+            if not self.literal:
+                self._close_value()
+            return True
+        if mode == "done":
+            return False
+        if char.isspace():
+            return True
+
+        if mode == "start":
+            if char != "{":
+                return False
+            self.stack.append("o")
+            self.mode = "key_or_close"
+            return True
+        if mode in ("value", "value_or_close"):
+            if mode == "value_or_close" and char == "]":
+                self.stack.pop()
+                self._close_value()
+                return True
+            return self._start_value(char)
+        if mode in ("key", "key_or_close"):
+            if mode == "key_or_close" and char == "}":
+                self.stack.pop()
+                self._close_value()
+                return True
+            if char != '"':
+                return False
+            self.mode = "string"
+            self.is_key = True
+            self.key = ""
+            return True
+        if mode == "colon":
+            if char != ":":
+                return False
+            if self._checking_keys():
+                self.expected_container = self.top_level_keys[self.key]
+            self.mode = "value"
+            return True
+        if mode == "comma_or_close":
+            container = self.stack[-1]
+            if char == ",":
+                self.mode = "key" if container == "o" else "value"
+                return True
+            if (char == "}" and container == "o") or (char == "]" and container == "a"):
+                self.stack.pop()
+                self._close_value()
+                return True
+            return False
+        return False
@@ -2,53 +2,149 @@ import re
 import math
 import json
 import torch
+import hashlib
+import functools
 
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from transformers import AutoTokenizer
 
 from config import get_logger
+from src.speculative import SpeculativeDecoder
+from src.inference_backend import load_model
+from src.batch_engine import BatchGenerationEngine
+from src.json_prefix_parser import top_level_schema
+from src.constrained_decoding import JsonSchemaLogitsProcessor
+from utils.validator import Resume
 from utils.file_reader import json_reader, text_reader
 
 logger = get_logger("MainModule")
 
+HEADING_PATTERN = re.compile(r"^(?=#{1,6}\s)", re.MULTILINE)
+PARAGRAPH_PATTERN = re.compile(r"(?<=\n\n)")
+LINE_PATTERN = re.compile(r"(?<=\n)")
+JSON_BLOCK_PATTERN = re.compile(r'```json\n(.*?)\n```', re.DOTALL)
+# A repair may generate at least this many tokens, or its invalid sections' current size times the
+# headroom: corrected sections are about as long as the invalid ones, plus the fence and the fixes
+REPAIR_MIN_NEW_TOKENS = 256
+REPAIR_TOKEN_HEADROOM = 1.25
+
+
+def merge_chunk_extractions(extractions):
+    """
+    Combine the JSON objects extracted from separate chunks: lists are concatenated,
+    objects and scalars keep the first non-empty value.
+    """
+    merged = {}
+    for extraction in extractions:
+        for key, value in extraction.items():
+            if key not in merged or not merged[key]:
+                merged[key] = value
+            elif isinstance(merged[key], list) and isinstance(value, list):
+                merged[key] = merged[key] + value
+    return merged
+
 
 class LLM:
-    def __init__(self, model_name="Qwen/Qwen2.5-7B-Instruct", max_chunk_size=1024):
+    # Bump whenever the summarizer or extractor prompts change, so cached extractions are invalidated
+    PROMPT_VERSION = "1"
+    EXTRACTION_MODES = ("auto", "two_pass", "single_pass")
+
+    def __init__(self, model_name="Qwen/Qwen2.5-7B-Instruct", max_chunk_size=None, max_context_length=4096,
+                 max_new_tokens=512, max_batch_size=8, max_wait_ms=20, prefix_caching=True,
+                 extraction_mode="auto", single_pass_max_tokens=None, constrained_decoding=False,
+                 speculative=None, backend="torch"):
+        if extraction_mode not in self.EXTRACTION_MODES:
+            raise ValueError(f"extraction_mode must be one of {self.EXTRACTION_MODES}")
+
         self.model_name = model_name
+        self.extraction_mode = extraction_mode
+        self.single_pass_max_tokens = single_pass_max_tokens
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.max_chunk_size = max_chunk_size
-        self.model = AutoModelForCausalLM.from_pretrained(
-            self.model_name,
-            torch_dtype=torch.float16,
-            device_map=self.device
-        )
-        self.model = torch.compile(self.model)
+        self.max_context_length = max_context_length
+        self.max_new_tokens = max_new_tokens
+        self.backend = backend
+        self.model = load_model(self.model_name, backend=backend, device=self.device)
+        self.device = self.model.device
         self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-        self.summary_text = ""
+        # speculative: {"mode": "draft" | "prompt_lookup", "draft_model": ..., ...}; None decodes normally
+        self.speculative_decoder = SpeculativeDecoder(self.model, **speculative) if speculative else None
+        self.engine = BatchGenerationEngine(
+            self.model,
+            self.tokenizer,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            max_new_tokens=max_new_tokens,
+            prefix_caching=prefix_caching,
+            speculative_decoder=self.speculative_decoder
+        )
+        self.prompt_parts_cache = {}
+        self.constrained_decoding = constrained_decoding
+        self.eos_token_ids = self.model.generation_config.eos_token_id or self.tokenizer.eos_token_id
+        self.resume_json_constraint = self.json_constraint()
 
-    def chunk_text(self, text, overlap_size=20):
+    def split_sections(self, text, pattern=HEADING_PATTERN):
         """
-        Splits text into smaller chunks that fit within the model's maximum input size.
+        Split markdown at headings, keeping each heading with the text below it.
         """
-        tokens = self.tokenizer(text, return_tensors="pt", truncation=False)["input_ids"][0]
-        total_length = tokens.size(0)
-        chunks = []
-
-        # Validate that overlap_size is not larger than max_chunk_size
-        if overlap_size >= self.max_chunk_size:
-            raise ValueError("overlap_size must be smaller than max_chunk_size to avoid infinite loops.")
+        return [section for section in pattern.split(text) if section.strip()]
 
-        start = 0
-        while start < total_length:
-            end = min(start + self.max_chunk_size, total_length)
-            chunks.append(tokens[start:end])
+    def _split_oversized(self, section_text, budget):
+        """
+        Break a section larger than the budget at paragraphs, then lines, then fixed token windows.
+        """
+        for pattern in (PARAGRAPH_PATTERN, LINE_PATTERN):
+            parts = self.split_sections(section_text, pattern)
+            if len(parts) > 1:
+                return self.pack_sections(parts, budget)
 
-            start = end - overlap_size
+        token_ids = self.tokenizer(section_text, add_special_tokens=False)["input_ids"]
+        return [token_ids[start:start + budget] for start in range(0, len(token_ids), budget)]
 
-            if end == total_length or start >= total_length:
-                break
-                
+    def pack_sections(self, sections, budget):
+        """
+        Greedily pack whole sections into chunks of at most `budget` tokens.
+        """
+        section_ids = self.tokenizer(sections, add_special_tokens=False)["input_ids"]
+        chunks = []
+        current = []
+        for section_text, ids in zip(sections, section_ids):
+            if len(ids) > budget:
+                if current:
+                    chunks.append(current)
+                    current = []
+                chunks.extend(self._split_oversized(section_text, budget))
+            elif len(current) + len(ids) > budget:
+                chunks.append(current)
+                current = list(ids)
+            else:
+                current.extend(ids)
+        if current:
+            chunks.append(current)
         return chunks
 
+    def chunk_text(self, text, budget=None):
+        """
+        Splits text into chunks of token ids that fit within the token budget, cutting at
+        markdown headings so that sections are not split mid-sentence.
+        """
+        budget = budget or self.max_chunk_size
+        if not budget or budget <= 0:
+            raise ValueError("The prompt leaves no room for resume text; increase max_context_length.")
+
+        sections = self.split_sections(text)
+        if not sections:
+            return []
+        return self.pack_sections(sections, budget)
+
+    def chunk_budget(self, prefix_ids, suffix_ids):
+        """
+        Tokens left for resume text once the prompt and the generated output are accounted for.
+        """
+        budget = self.max_context_length - len(prefix_ids) - len(suffix_ids) - self.max_new_tokens
+        if self.max_chunk_size:
+            budget = min(budget, self.max_chunk_size)
+        return budget
+
 
     def create_summarizer_prompt(self):
         SYSTEM_PROMPT = """You are a highly intelligent AI designed to generate concise, accurate, and clear summaries. 
@@ -106,61 +202,228 @@ class LLM:
 
         return SYSTEM_PROMPT, schema_description + example_schema
     
+    def prompt_parts(self, system_prompt, schema_description):
+        """
+        Token ids of the chat template before and after the resume chunk, and a key identifying the prefix.
+        Everything before the chunk is constant for a prompt version, which lets its KV cache be reused.
+        """
+        cache_key = (system_prompt, schema_description)
+        if cache_key not in self.prompt_parts_cache:
+            placeholder = "<<RESUME_CHUNK>>"
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"{schema_description}\n\nResume Chunk:\n{placeholder}"}
+            ]
+            text = self.tokenizer.apply_chat_template(
+                messages,
+                tokenize=False,
+                add_generation_prompt=True
+            )
+            prefix_text, suffix_text = text.split(placeholder)
+            prefix_ids = self.tokenizer(prefix_text, add_special_tokens=False)["input_ids"]
+            suffix_ids = self.tokenizer(suffix_text, add_special_tokens=False)["input_ids"]
+            prefix_key = f"{self.PROMPT_VERSION}:{hashlib.sha256(prefix_text.encode('utf-8')).hexdigest()[:16]}"
+            self.prompt_parts_cache[cache_key] = (prefix_ids, suffix_ids, prefix_key)
+        return self.prompt_parts_cache[cache_key]
+
+    def decoding_stats(self):
+        """
+        Acceptance rate and tokens/sec of speculative decoding, None when it is off.
+        """
+        return self.speculative_decoder.stats() if self.speculative_decoder else None
+
+    def json_constraint(self, keys=None):
+        """
+        Factory of logits processors that keep the output a valid JSON object over the Resume fields (or `keys`).
+        """
+        return functools.partial(
+            JsonSchemaLogitsProcessor,
+            self.tokenizer,
+            self.eos_token_ids,
+            top_level_schema(Resume, keys)
+        )
+
     def count_tokens(self, chunks):
         """
         Calculate token size 
         """
         token_size = 0 
-        token_size += sum(chunk.size(0) for chunk in chunks)
+        token_size += sum(len(chunk) for chunk in chunks)
         return token_size
 
-    def generate_response(self, resume_text, system_prompt, schema_description):
+    def generate_chunk_responses(self, resume_text, system_prompt, schema_description, logits_processor_factory=None):
         """
-        Generate LLM response
+        Generate one LLM response per chunk of the text
         """
-        chunks = self.chunk_text(resume_text)
+        prefix_ids, suffix_ids, prefix_key = self.prompt_parts(system_prompt, schema_description)
+        chunks = self.chunk_text(resume_text, budget=self.chunk_budget(prefix_ids, suffix_ids))
 
         token_size = self.count_tokens(chunks)
-        logger.info(f"\nToken size:\n {token_size}")
+        logger.info(f"\nToken size:\n {token_size} in {len(chunks)} chunks")
 
-        complete_response = ""
-        for chunk in chunks:
-            chunk_text = self.tokenizer.decode(chunk, skip_special_tokens=True)
-            prompt = f"{schema_description}\n\nResume Chunk:\n{chunk_text}"
+        # Chunk token ids go straight into the prompt, without a decode/re-tokenize round trip
+        prompts = [prefix_ids + chunk_ids + suffix_ids for chunk_ids in chunks]
 
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ]
-            text = self.tokenizer.apply_chat_template(
-                messages,
-                tokenize=False,
-                add_generation_prompt=True
-            )
-            model_inputs = self.tokenizer([text], return_tensors="pt").to(self.model.device)
+        # Chunks of this resume are batched together with chunks of every other in-flight resume
+        return self.engine.generate(
+            prompts,
+            max_new_tokens=self.max_new_tokens,
+            prefix_key=prefix_key,
+            prefix_length=len(prefix_ids),
+            logits_processor_factory=logits_processor_factory
+        )
 
-            generated_ids = self.model.generate(
-                **model_inputs,
-                max_new_tokens=512,
-                num_beams=1
-            )
-            generated_ids = [
-                output_ids[len(input_ids):] for input_ids, output_ids in zip(model_inputs.input_ids, generated_ids)
-            ]
+    def generate_response(self, resume_text, system_prompt, schema_description):
+        """
+        Generate LLM response
+        """
+        responses = self.generate_chunk_responses(resume_text, system_prompt, schema_description)
 
-            response = self.tokenizer.batch_decode(generated_ids, skip_special_tokens=True)[0]
+        complete_response = ""
+        for response in responses:
             complete_response += response.strip() + "\n"
         return complete_response
+
+    def parse_json_responses(self, responses, max_new_tokens):
+        """
+        Parse constrained outputs, which are bare JSON objects. Outputs that do not parse (cut off by
+        max_new_tokens, or left the grammar on an unconstrained step) are logged and skipped.
+        """
+        extractions = []
+        for response in responses:
+            try:
+                extractions.append(json.loads(response))
+            except json.JSONDecodeError as error:
+                token_count = len(self.tokenizer(response, add_special_tokens=False)["input_ids"])
+                if token_count >= max_new_tokens:
+                    logger.error(f"Constrained output was truncated at max_new_tokens={max_new_tokens}: {error}")
+                else:
+                    logger.error(f"Constrained output is not valid JSON: {error}")
+        return merge_chunk_extractions(extractions) if extractions else None
         
 
-    def __call__(self, resume_text, retry=False):
-        if not retry:
-            system_prompt, schema_description = self.create_summarizer_prompt()
-            self.summary_text = self.generate_response(resume_text, system_prompt, schema_description)
+    def choose_path(self, resume_text):
+        """
+        Pick single-pass extraction when the resume fits into one extraction chunk, two-pass
+        (summarize, then extract) otherwise. extraction_mode can force either path.
+        """
+        if self.extraction_mode != "auto":
+            return self.extraction_mode
+
+        token_size = self.count_tokens([self.tokenizer(resume_text, add_special_tokens=False)["input_ids"]])
+        limit = self.single_pass_max_tokens
+        if limit is None:
+            system_prompt, schema_description = self.create_json_extractor_prompt()
+            prefix_ids, suffix_ids, _ = self.prompt_parts(system_prompt, schema_description)
+            limit = self.chunk_budget(prefix_ids, suffix_ids)
+
+        path = "single_pass" if token_size <= limit else "two_pass"
+        logger.info(f"Extraction path: {path} ({token_size} tokens, single-pass limit {limit})")
+        return path
+
+    def summarize(self, resume_text):
+        """
+        First pass: condense the resume into a summary.
+        """
+        system_prompt, schema_description = self.create_summarizer_prompt()
+        return self.generate_response(resume_text, system_prompt, schema_description)
+
+    def extract(self, summary_text):
+        """
+        Second pass: extract the JSON resume from a summary. Returns the fenced JSON match, or the
+        parsed dict when constrained decoding is on.
+        """
         system_prompt, schema_description = self.create_json_extractor_prompt()
-        complete_response = self.generate_response(self.summary_text, system_prompt, schema_description)
+        if self.constrained_decoding:
+            responses = self.generate_chunk_responses(
+                summary_text, system_prompt, schema_description, logits_processor_factory=self.resume_json_constraint
+            )
+            return self.parse_json_responses(responses, self.max_new_tokens)
+
+        complete_response = self.generate_response(summary_text, system_prompt, schema_description)
+
+        return JSON_BLOCK_PATTERN.search(complete_response)
+
+    def create_repair_prompt(self, invalid_sections, source_text=None):
+        SYSTEM_PROMPT = """You are a highly intelligent AI designed to fix sections of an extracted JSON resume that failed schema validation."""
+
+        schema_description = f"""The following resume sections failed validation. For every section you get its current value and the validation errors.
+        Return a single JSON object whose keys are exactly these section names and whose values are the corrected sections.
+        Dates must use the format dd/mm/yyyy and URLs must be complete. Drop entries that cannot be corrected.
+        Output the JSON object in a ```json block and nothing else.
+
+        INVALID SECTIONS:
+        {json.dumps(invalid_sections, indent=2, default=str)}
+        """
+
+        if source_text:
+            schema_description += f"""
+        RESUME TEXT:
+        {source_text}
+        """
+
+        return SYSTEM_PROMPT, schema_description
 
-        json_match = re.search(r'```json\n(.*?)\n```', complete_response, re.DOTALL)
+    def repair_max_new_tokens(self, invalid_sections):
+        """
+        Tokens a repair of the given sections may generate, sized from their current JSON.
+        """
+        current = json.dumps({name: section["content"] for name, section in invalid_sections.items()}, indent=2, default=str)
+        current_tokens = len(self.tokenizer(current, add_special_tokens=False)["input_ids"])
+        return max(REPAIR_MIN_NEW_TOKENS, math.ceil(current_tokens * REPAIR_TOKEN_HEADROOM))
+
+    def repair(self, invalid_sections, source_text=None, max_new_tokens=None):
+        """
+        Fix all invalid sections in one short generation instead of a full chunked extraction per section.
+        `invalid_sections` maps section names to {"content": ..., "errors": [...]}. max_new_tokens defaults to
+        repair_max_new_tokens and is capped by the context the prompt leaves. The resume text is only
+        needed for sections that are missing entirely, and is truncated to the context left for it.
+        """
+        if max_new_tokens is None:
+            max_new_tokens = self.repair_max_new_tokens(invalid_sections)
+        placeholder = "<<RESUME_TEXT>>"
+        system_prompt, prompt = self.create_repair_prompt(invalid_sections, placeholder if source_text else None)
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+        text = self.tokenizer.apply_chat_template(
+            messages,
+            tokenize=False,
+            add_generation_prompt=True
+        )
+        if source_text:
+            prefix_text, suffix_text = text.rsplit(placeholder, 1)
+            prefix_ids = self.tokenizer(prefix_text, add_special_tokens=False)["input_ids"]
+            suffix_ids = self.tokenizer(suffix_text, add_special_tokens=False)["input_ids"]
+        else:
+            prefix_ids, suffix_ids = self.tokenizer(text, add_special_tokens=False)["input_ids"], []
+        max_new_tokens = min(max_new_tokens, self.max_context_length - len(prefix_ids) - len(suffix_ids))
+
+        source_ids = []
+        if source_text:
+            # The resume text gets whatever the tokenized repair prompt and the generation leave
+            budget = self.max_context_length - len(prefix_ids) - len(suffix_ids) - max_new_tokens
+            source_ids = self.tokenizer(source_text, add_special_tokens=False)["input_ids"][:max(budget, 0)]
+        input_ids = prefix_ids + source_ids + suffix_ids
+        if self.constrained_decoding:
+            response = self.engine.submit(
+                input_ids, max_new_tokens=max_new_tokens, logits_processor_factory=self.json_constraint(list(invalid_sections))
+            ).result()
+            return self.parse_json_responses([response], max_new_tokens)
+
+        response = self.engine.submit(input_ids, max_new_tokens=max_new_tokens).result()
+        return JSON_BLOCK_PATTERN.search(response)
+
+    def __call__(self, resume_text, retry=False):
+        """
+        Extract the JSON resume. With retry, resume_text is the summary of an earlier call and is not summarized again.
+        The summary stays local, since one LLM instance serves concurrent requests.
+        """
+        summary_text = resume_text
+        if not retry and self.choose_path(resume_text) == "two_pass":
+            summary_text = self.summarize(resume_text)
+        json_match = self.extract(summary_text)
         return json_match
         # if json_match:
         #     json_string = json_match.group(1)
@@ -0,0 +1,202 @@
+import time
+import threading
+
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+THROUGHPUT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    pairs = list(key) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+def _snapshot_key(key, default):
+    return ",".join(f"{name}={value}" for name, value in key) or default
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, key, value) for key, value in self.values.items()]
+
+    def snapshot(self):
+        with self.lock:
+            return {_snapshot_key(key, "total"): value for key, value in self.values.items()}
+
+
+class Gauge:
+    """
+    A value that goes up and down. set_function reads the value at scrape time, e.g. a queue's qsize.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.values = {}
+        self.functions = {}
+        self.lock = threading.Lock()
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[_label_key(labels)] = value
+
+    def set_function(self, function, **labels):
+        with self.lock:
+            self.functions[_label_key(labels)] = function
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+            functions = dict(self.functions)
+        for key, function in functions.items():
+            try:
+                values[key] = function()
+            except Exception:
+                continue
+        return [(self.name, key, value) for key, value in values.items()]
+
+    def snapshot(self):
+        return {_snapshot_key(key, "value"): value for _, key, value in self.samples()}
+
+
+class Histogram:
+    """
+    Cumulative buckets, sum and count per label set, as in the Prometheus exposition format.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, series in self.series.items():
+                for bound, count in zip(self.buckets, series["counts"]):
+                    samples.append((f"{self.name}_bucket", key + (("le", repr(float(bound))),), count))
+                samples.append((f"{self.name}_bucket", key + (("le", "+Inf"),), series["count"]))
+                samples.append((f"{self.name}_sum", key, series["sum"]))
+                samples.append((f"{self.name}_count", key, series["count"]))
+        return samples
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                _snapshot_key(key, "all"): {
+                    "count": series["count"],
+                    "sum": round(series["sum"], 6),
+                    "mean": round(series["sum"] / series["count"], 6) if series["count"] else None,
+                }
+                for key, series in self.series.items()
+            }
+
+
+class MetricsRegistry:
+    """
+    Process-wide collection of metrics, rendered in the Prometheus text format for /metrics.
+    Asking twice for the same name returns the same metric.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = cls(name, *args)
+            return self.metrics[name]
+
+    def counter(self, name, help_text):
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name, help_text):
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram("talentmatrix_stage_seconds", "Latency of each processing stage in seconds.")
+STAGE_FAILURES = metrics.counter("talentmatrix_stage_failures_total", "Stage executions that raised an exception.")
+STAGE_ITEMS = metrics.counter("talentmatrix_stage_items_total", "Items processed per stage (texts embedded, rows written, ...).")
+VALIDATION_RETRIES = metrics.counter("talentmatrix_validation_retries_total", "LLM repair rounds after failed validation.")
+VALIDATION_RESULTS = metrics.counter("talentmatrix_validation_results_total", "Validated resumes by outcome.")
+LLM_TOKENS = metrics.counter("talentmatrix_llm_tokens_total", "Prompt (in) and generated (out) LLM tokens.")
+LLM_TOKENS_PER_SECOND = metrics.histogram(
+    "talentmatrix_llm_generation_tokens_per_second", "Generated tokens per second of each batch.", THROUGHPUT_BUCKETS
+)
+QUEUE_DEPTH = metrics.gauge("talentmatrix_queue_depth", "Items waiting in a queue.")
+
+
+@contextmanager
+def stage_timer(stage, items=None):
+    """
+    Record the latency of the block under `stage`, and `items` processed items when given.
+    Failures are counted and re-raised.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_FAILURES.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+    if items is not None:
+        STAGE_ITEMS.inc(items, stage=stage)
@@ -0,0 +1,116 @@
+import os
+import numpy as np
+
+from config import get_logger
+
+logger = get_logger("MainModule")
+
+
+class OnnxEmbeddingModel:
+    """
+    BGE encoder exported to ONNX with dynamically quantized int8 weights, run by onnxruntime on CPU.
+    Exposes the same encode(texts) as FlagModel: CLS pooling, L2-normalized, one float32 row per text.
+
+    The graph is exported and quantized once into onnx_dir and reused afterwards. Texts are
+    sorted by token length and batched in that order, so each batch is padded only to the
+    longest text in it instead of the longest text overall.
+    """
+    def __init__(self, model_name='BAAI/bge-base-en-v1.5', onnx_dir='data/onnx', batch_size=32, max_length=512,
+                 num_threads=None):
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model_path = os.path.join(onnx_dir, model_name.replace("/", "__"), "model.int8.onnx")
+
+        if not os.path.exists(self.model_path):
+            self.export(model_name, self.model_path)
+        self.session = self._create_session(num_threads)
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    @staticmethod
+    def export(model_name, model_path):
+        """
+        Export the encoder to ONNX with dynamic batch and sequence axes, then quantize its
+        weights to int8 with onnxruntime's dynamic quantization.
+        """
+        import torch
+        from transformers import AutoModel
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        os.makedirs(os.path.dirname(model_path), exist_ok=True)
+        fp32_path = model_path.replace(".int8.onnx", ".fp32.onnx")
+        logger.info(f"Exporting {model_name} to {model_path}")
+
+        model = AutoModel.from_pretrained(model_name, torch_dtype=torch.float32)
+        model.eval()
+        dummy = torch.ones((1, 8), dtype=torch.long)
+        dynamic_axes = {"input_ids": {0: "batch", 1: "sequence"}, "attention_mask": {0: "batch", 1: "sequence"},
+                        "last_hidden_state": {0: "batch", 1: "sequence"}}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (dummy, dummy),
+                fp32_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=17
+            )
+
+        quantize_dynamic(fp32_path, model_path, weight_type=QuantType.QInt8)
+        os.remove(fp32_path)
+
+    def _create_session(self, num_threads):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        return onnxruntime.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+
+    def _run(self, input_ids):
+        length = max(len(ids) for ids in input_ids)
+        batch_ids = np.full((len(input_ids), length), self.tokenizer.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(input_ids), length), dtype=np.int64)
+        for row, ids in enumerate(input_ids):
+            batch_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+
+        feed = {"input_ids": batch_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feed["token_type_ids"] = np.zeros_like(batch_ids)
+        hidden = self.session.run(["last_hidden_state"], feed)[0]
+
+        cls = hidden[:, 0].astype(np.float32, copy=False)
+        return cls / np.linalg.norm(cls, axis=1, keepdims=True)
+
+    def encode(self, texts):
+        if isinstance(texts, str):
+            texts = [texts]
+        input_ids = self.tokenizer(texts, truncation=True, max_length=self.max_length)["input_ids"]
+
+        order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+        embeddings = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            batch = self._run([input_ids[i] for i in rows])
+            if embeddings.shape[1] == 0:
+                embeddings = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+            embeddings[rows] = batch
+        return embeddings
+
+
+def load_embedding_model(model_name, backend="flag", **kwargs):
+    """
+    "flag" loads FlagEmbedding's fp16 model (fast on GPU), "onnx_int8" the quantized ONNX graph for CPU.
+    """
+    if backend == "flag":
+        from FlagEmbedding import FlagModel
+        return FlagModel(model_name, use_fp16=True)
+    if backend == "onnx_int8":
+        return OnnxEmbeddingModel(model_name, **kwargs)
+    raise ValueError(f"Unknown embedding backend: {backend}. Available: ['flag', 'onnx_int8']")
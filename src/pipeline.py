@@ -0,0 +1,249 @@
+import time
+import queue
+import threading
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from config import get_logger
+from src.metrics import STAGE_SECONDS, STAGE_ITEMS, STAGE_FAILURES, QUEUE_DEPTH
+
+logger = get_logger("MainModule")
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self.started_at = None
+        self.finished_at = None
+        self.lock = threading.Lock()
+
+    def record(self, items, seconds, failures=0):
+        with self.lock:
+            if self.started_at is None:
+                self.started_at = time.perf_counter() - seconds
+            self.items += items
+            self.failures += failures
+            self.busy_seconds += seconds
+            self.finished_at = time.perf_counter()
+        STAGE_SECONDS.observe(seconds, stage=f"pipeline_{self.name}")
+        STAGE_ITEMS.inc(items, stage=f"pipeline_{self.name}")
+        if failures:
+            STAGE_FAILURES.inc(failures, stage=f"pipeline_{self.name}")
+
+    def to_dict(self):
+        wall_seconds = (self.finished_at - self.started_at) if self.started_at is not None else 0.0
+        return {
+            "items": self.items,
+            "failures": self.failures,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wall_seconds": round(wall_seconds, 3),
+            "items_per_sec": round(self.items / wall_seconds, 2) if wall_seconds else None,
+        }
+
+
+class ResumePipeline:
+    """
+    Staged batch processor for folders of resumes:
+
+        parse (process pool) -> inference -> batched embed/query -> DB sink
+
+    Stages are connected by bounded queues, so a slow stage blocks the ones in front of it
+    instead of letting work pile up in memory.
+
+    parse_fn(path) -> markdown            runs in worker processes, must be picklable
+    lookup_fn(path) -> markdown or None   optional shortcut for already parsed files
+    extract_fn(path, text) -> (data, ok)  runs on inference_workers threads sharing one model
+    match_fn({path: (text, data)}) -> {path: results}
+    sink_fn([results, ...])               writes a batch of results
+    """
+    def __init__(self, parse_fn, extract_fn, match_fn, sink_fn, lookup_fn=None, parse_workers=4,
+                 inference_workers=1, queue_size=16, match_batch_size=32, sink_batch_size=64, batch_wait_s=0.5):
+        self.parse_fn = parse_fn
+        self.extract_fn = extract_fn
+        self.match_fn = match_fn
+        self.sink_fn = sink_fn
+        self.lookup_fn = lookup_fn
+        self.parse_workers = parse_workers
+        self.inference_workers = inference_workers
+        self.queue_size = queue_size
+        self.match_batch_size = match_batch_size
+        self.sink_batch_size = sink_batch_size
+        self.batch_wait_s = batch_wait_s
+
+    def run(self, resume_paths):
+        self.stats = {name: StageStats(name) for name in ("parse", "inference", "match", "sink")}
+        self.results = {}
+        self.results_lock = threading.Lock()
+
+        parsed = queue.Queue(maxsize=self.queue_size)
+        extracted = queue.Queue(maxsize=self.queue_size)
+        matched = queue.Queue(maxsize=self.queue_size)
+        for name, stage_queue in (("pipeline_parsed", parsed), ("pipeline_extracted", extracted), ("pipeline_matched", matched)):
+            QUEUE_DEPTH.set_function(stage_queue.qsize, queue=name)
+
+        threads = [threading.Thread(target=self._parse_stage, args=(resume_paths, parsed), name="ParseStage")]
+        threads += [
+            threading.Thread(target=self._inference_stage, args=(parsed, extracted), name=f"InferenceStage-{i}")
+            for i in range(self.inference_workers)
+        ]
+        threads.append(threading.Thread(target=self._match_stage, args=(extracted, matched), name="MatchStage"))
+        threads.append(threading.Thread(target=self._sink_stage, args=(matched,), name="SinkStage"))
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        report = {name: stats.to_dict() for name, stats in self.stats.items()}
+        report["total"] = {
+            "items": len(resume_paths),
+            "wall_seconds": round(time.perf_counter() - start, 3),
+        }
+        logger.info(f"\nPipeline stage throughput:\n {report}")
+        return self.results, report
+
+    def _set_result(self, path, value):
+        with self.results_lock:
+            self.results[path] = value
+
+    def _parse_stage(self, resume_paths, parsed):
+        stats = self.stats["parse"]
+        in_flight = {}
+        paths = iter(resume_paths)
+
+        # Workers are spawned: forking a parent that runs the generation engine's threads and
+        # holds torch state can deadlock the children
+        try:
+            with ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+                exhausted = False
+                while not exhausted or in_flight:
+                    # Keep at most queue_size files in the process pool
+                    while not exhausted and len(in_flight) < self.queue_size:
+                        path = next(paths, None)
+                        if path is None:
+                            exhausted = True
+                            break
+                        try:
+                            text = self.lookup_fn(path) if self.lookup_fn else None
+                        except Exception as e:
+                            logger.error(f"Error reading {path}: {e}")
+                            self._set_result(path, None)
+                            stats.record(0, 0.0, failures=1)
+                            continue
+                        if text is not None:
+                            parsed.put((path, text))
+                            stats.record(1, 0.0)
+                            continue
+                        in_flight[executor.submit(self.parse_fn, path)] = (path, time.perf_counter())
+
+                    if not in_flight:
+                        continue
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path, submitted = in_flight.pop(future)
+                        try:
+                            parsed.put((path, future.result()))
+                            stats.record(1, time.perf_counter() - submitted)
+                        except Exception as e:
+                            logger.error(f"Error parsing {path}: {e}")
+                            self._set_result(path, None)
+                            stats.record(0, time.perf_counter() - submitted, failures=1)
+        finally:
+            # Downstream stages wait for these markers, so they are posted even if this stage fails
+            for _ in range(self.inference_workers):
+                parsed.put(_DONE)
+
+    def _inference_stage(self, parsed, extracted):
+        stats = self.stats["inference"]
+        while True:
+            item = parsed.get()
+            if item is _DONE:
+                break
+            path, text = item
+            start = time.perf_counter()
+            try:
+                data, flag = self.extract_fn(path, text)
+            except Exception as e:
+                logger.error(f"Error extracting {path}: {e}")
+                self._set_result(path, None)
+                stats.record(0, time.perf_counter() - start, failures=1)
+                continue
+
+            stats.record(1, time.perf_counter() - start, failures=0 if flag else 1)
+            if flag:
+                extracted.put((path, text, data))
+            else:
+                self._set_result(path, data)
+        extracted.put(_DONE)
+
+    def _collect(self, source, batch_size, expected_done):
+        """
+        Gather up to batch_size items, waiting at most batch_wait_s after the first one.
+        Returns the batch and the number of end markers seen.
+        """
+        batch = []
+        done = 0
+        deadline = None
+        while len(batch) < batch_size and done < expected_done:
+            timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            try:
+                item = source.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is _DONE:
+                done += 1
+                continue
+            batch.append(item)
+            if deadline is None:
+                deadline = time.perf_counter() + self.batch_wait_s
+        return batch, done
+
+    def _match_stage(self, extracted, matched):
+        stats = self.stats["match"]
+        remaining = self.inference_workers
+        while remaining:
+            batch, done = self._collect(extracted, self.match_batch_size, remaining)
+            remaining -= done
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                results = self.match_fn({path: (text, data) for path, text, data in batch})
+            except Exception as e:
+                logger.error(f"Error matching batch of {len(batch)} resumes: {e}")
+                for path, _, _ in batch:
+                    self._set_result(path, None)
+                stats.record(0, time.perf_counter() - start, failures=len(batch))
+                continue
+
+            stats.record(len(batch), time.perf_counter() - start)
+            for path, result in results.items():
+                self._set_result(path, result)
+                if result:
+                    matched.put(result)
+        matched.put(_DONE)
+
+    def _sink_stage(self, matched):
+        stats = self.stats["sink"]
+        finished = False
+        while not finished:
+            batch, done = self._collect(matched, self.sink_batch_size, 1)
+            finished = done == 1
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                self.sink_fn(batch)
+                stats.record(len(batch), time.perf_counter() - start)
+            except Exception as e:
+                logger.error(f"Error saving batch of {len(batch)} results: {e}")
+                stats.record(0, time.perf_counter() - start, failures=len(batch))
@@ -0,0 +1,58 @@
+import threading
+import torch
+
+from transformers import DynamicCache
+
+from config import get_logger
+
+logger = get_logger("MainModule")
+
+
+class PrefixKVCache:
+    """
+    Keeps the KV cache of constant prompt prefixes (system prompt, schema, few-shot example).
+    Each prefix is prefilled once; every later prompt starting with it only prefills its own suffix.
+    """
+    def __init__(self, model, max_entries=8):
+        self.model = model
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def register(self, key, prefix_ids):
+        """
+        Run the prefix through the model once and keep its key/value tensors.
+        """
+        with self.lock:
+            if key in self.entries:
+                return
+            if len(self.entries) >= self.max_entries:
+                # Prefixes only change with the prompt version, so dropping the oldest is enough
+                self.entries.pop(next(iter(self.entries)))
+
+            input_ids = torch.tensor([prefix_ids], dtype=torch.long, device=self.model.device)
+            with torch.inference_mode():
+                outputs = self.model(input_ids=input_ids, use_cache=True)
+
+            past_key_values = outputs.past_key_values
+            if isinstance(past_key_values, DynamicCache):
+                past_key_values = past_key_values.to_legacy_cache()
+            self.entries[key] = (len(prefix_ids), past_key_values)
+            logger.info(f"\nCached KV for prompt prefix {key} ({len(prefix_ids)} tokens)")
+
+    def prefix_length(self, key):
+        return self.entries[key][0]
+
+    def build(self, key, batch_size):
+        """
+        A fresh cache for a batch starting with the prefix. Generation appends to new tensors,
+        so the stored prefix tensors are never modified.
+        """
+        _, past_key_values = self.entries[key]
+        return DynamicCache.from_legacy_cache(tuple(
+            (keys.expand(batch_size, -1, -1, -1), values.expand(batch_size, -1, -1, -1))
+            for keys, values in past_key_values
+        ))
@@ -0,0 +1,66 @@
+import time
+import threading
+
+from config import get_logger
+
+logger = get_logger("MainModule")
+
+
+class ComponentRegistry:
+    """
+    Builds heavy components (models, database clients) on first use instead of at import time.
+    Records how long each component took to load so startup cost is visible.
+    """
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._locks = {}
+        self.load_times = {}
+
+    def register(self, name, factory):
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+
+    def override(self, name, instance):
+        """
+        Use a prebuilt instance for a component, e.g. a stub in benchmarks.
+        """
+        if name not in self._factories:
+            raise KeyError(f"Unknown component: {name}")
+        self._instances[name] = instance
+        self.load_times[name] = 0.0
+
+    def get(self, name):
+        if name in self._instances:
+            return self._instances[name]
+        if name not in self._factories:
+            raise KeyError(f"Unknown component: {name}")
+
+        with self._locks[name]:
+            # Another thread may have finished loading while we waited for the lock
+            if name not in self._instances:
+                start = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self.load_times[name] = time.perf_counter() - start
+                logger.info(f"Loaded component '{name}' in {self.load_times[name]:.2f}s")
+        return self._instances[name]
+
+    def is_loaded(self, name):
+        return name in self._instances
+
+    def warm_up(self, names=None):
+        """
+        Load the given components (all registered ones by default) ahead of the first request.
+        """
+        for name in (list(self._factories) if names is None else names):
+            self.get(name)
+        return self.status()
+
+    def status(self):
+        return {
+            name: {
+                "loaded": self.is_loaded(name),
+                "load_time_s": round(self.load_times[name], 3) if name in self.load_times else None
+            }
+            for name in self._factories
+        }
@@ -0,0 +1,197 @@
+import os
+import re
+import threading
+import numpy as np
+
+from config import get_logger
+
+logger = get_logger("MainModule")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the to was were will with "
+    "we you your our job position location description".split()
+)
+
+
+def tokenize(text):
+    """
+    Lowercased alphanumeric tokens; "+" and "#" are kept inside tokens so C++ and C# survive.
+    """
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over a document collection, keyed by the documents' Chroma ids.
+
+    Postings are kept as flat NumPy arrays sorted by term (CSR layout: indptr per term, then doc
+    numbers and BM25 weights), so scoring a query is a gather plus one bincount. Each add merges
+    the new postings with one vectorized sort and persists the index to an .npz file next to the
+    Chroma data.
+    """
+    def __init__(self, path=None, k1=1.2, b=0.75, max_query_terms=64):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        # Long queries (a whole resume) keep only their rarest terms, which carry most of the score
+        self.max_query_terms = max_query_terms
+        self.lock = threading.Lock()
+
+        self.vocabulary = {}
+        self.doc_keys = []
+        self.doc_numbers = {}
+        self.doc_lengths = np.zeros(0, dtype=np.int32)
+        # Term-sorted postings: term ids, doc numbers and term frequencies
+        self.posting_terms = np.zeros(0, dtype=np.int32)
+        self.posting_docs = np.zeros(0, dtype=np.int32)
+        self.posting_tfs = np.zeros(0, dtype=np.int32)
+        self.pending = []
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.weights = np.zeros(0, dtype=np.float32)
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.doc_keys)
+
+    def add(self, keys, texts, commit=True):
+        """
+        Index new documents. Keys already in the index are skipped.
+        With commit=False the postings are only buffered; bulk loads call commit() once at the end,
+        so the arrays are sorted and written once instead of once per batch.
+        """
+        with self.lock:
+            terms, docs, tfs, lengths = [], [], [], []
+            for key, text in zip(keys, texts):
+                if key in self.doc_numbers:
+                    continue
+                doc_number = len(self.doc_keys)
+                self.doc_numbers[key] = doc_number
+                self.doc_keys.append(key)
+
+                tokens = tokenize(text)
+                lengths.append(len(tokens))
+                counts = {}
+                for token in tokens:
+                    term = self.vocabulary.setdefault(token, len(self.vocabulary))
+                    counts[term] = counts.get(term, 0) + 1
+                terms.extend(counts)
+                tfs.extend(counts.values())
+                docs.extend([doc_number] * len(counts))
+
+            if not lengths:
+                return
+            self.doc_lengths = np.concatenate([self.doc_lengths, np.asarray(lengths, dtype=np.int32)])
+            self.pending.append((
+                np.asarray(terms, dtype=np.int32), np.asarray(docs, dtype=np.int32), np.asarray(tfs, dtype=np.int32)
+            ))
+        if commit:
+            self.commit()
+
+    def commit(self):
+        """
+        Merge buffered postings and persist the index.
+        """
+        with self.lock:
+            if not self.pending:
+                return
+            self._merge()
+        if self.path:
+            self.save()
+
+    def _merge(self):
+        """
+        Merge pending postings into the term-sorted arrays and recompute the BM25 weights,
+        which depend on the corpus size and average document length.
+        """
+        if self.pending:
+            terms = np.concatenate([self.posting_terms] + [pending[0] for pending in self.pending])
+            docs = np.concatenate([self.posting_docs] + [pending[1] for pending in self.pending])
+            tfs = np.concatenate([self.posting_tfs] + [pending[2] for pending in self.pending])
+            order = np.argsort(terms, kind="stable")
+            self.posting_terms, self.posting_docs, self.posting_tfs = terms[order], docs[order], tfs[order]
+            self.pending = []
+
+        num_terms = len(self.vocabulary)
+        num_docs = len(self.doc_keys)
+        document_frequency = np.bincount(self.posting_terms, minlength=num_terms)
+        self.indptr = np.concatenate([[0], np.cumsum(document_frequency)]).astype(np.int64)
+
+        self.idf = np.log1p((num_docs - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        average_length = max(float(self.doc_lengths.mean()), 1.0) if num_docs else 1.0
+        tf = self.posting_tfs.astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[self.posting_docs] / average_length)
+        self.weights = (self.idf[self.posting_terms] * tf * (self.k1 + 1) / (tf + norm)).astype(np.float32)
+
+    def scores(self, text):
+        """
+        BM25 score of every document for the query text, as an array indexed by doc number.
+        Callers hold the lock.
+        """
+        vocabulary = self.vocabulary
+        # Query term frequency is ignored, so every distinct token is looked up once
+        tokens = set(TOKEN_PATTERN.findall(text.lower()))
+        term_ids = np.fromiter([term for term in map(vocabulary.get, tokens) if term is not None], dtype=np.int64)
+        # Terms only seen in uncommitted documents have no postings yet
+        term_ids = term_ids[term_ids < len(self.idf)]
+        num_docs = len(self.doc_keys)
+        if not len(term_ids) or not num_docs:
+            return np.zeros(num_docs, dtype=np.float32)
+        if self.max_query_terms and len(term_ids) > self.max_query_terms:
+            term_ids = term_ids[np.argpartition(-self.idf[term_ids], self.max_query_terms - 1)[:self.max_query_terms]]
+
+        starts, ends = self.indptr[term_ids], self.indptr[term_ids + 1]
+        lengths = ends - starts
+        # Positions of every posting of the query terms, without a Python loop over terms
+        offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        positions = offsets + np.arange(lengths.sum())
+        return np.bincount(self.posting_docs[positions], weights=self.weights[positions], minlength=num_docs)
+
+    def search(self, text, top_k=10, score_keys=()):
+        """
+        The top_k (key, score) pairs with a positive score, best first, and a {key: score} dict of
+        `score_keys` (e.g. dense candidates to fuse with), from the same scoring pass.
+        """
+        with self.lock:
+            scores = self.scores(text)
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > top_k:
+                candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            hits = [(self.doc_keys[number], float(scores[number])) for number in candidates]
+            key_scores = {key: float(scores[self.doc_numbers[key]]) if key in self.doc_numbers else 0.0 for key in score_keys}
+        return hits, key_scores
+
+    def save(self):
+        with self.lock:
+            vocabulary = sorted(self.vocabulary, key=self.vocabulary.get)
+            arrays = {
+                "vocabulary": np.asarray(vocabulary, dtype=np.str_),
+                "doc_keys": np.asarray(self.doc_keys, dtype=np.str_),
+                "doc_lengths": self.doc_lengths,
+                "posting_terms": self.posting_terms,
+                "posting_docs": self.posting_docs,
+                "posting_tfs": self.posting_tfs,
+                "params": np.asarray([self.k1, self.b], dtype=np.float64),
+            }
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Write then rename, so a crash never leaves a truncated index behind
+        temporary_path = f"{self.path}.tmp.npz"
+        np.savez(temporary_path, **arrays)
+        os.replace(temporary_path, self.path)
+
+    def load(self):
+        with np.load(self.path, allow_pickle=False) as data:
+            self.vocabulary = {term: index for index, term in enumerate(data["vocabulary"].tolist())}
+            self.doc_keys = data["doc_keys"].tolist()
+            self.doc_lengths = data["doc_lengths"]
+            self.posting_terms = data["posting_terms"]
+            self.posting_docs = data["posting_docs"]
+            self.posting_tfs = data["posting_tfs"]
+            self.k1, self.b = data["params"].tolist()
+        self.doc_numbers = {key: number for number, key in enumerate(self.doc_keys)}
+        self._merge()
+        logger.info(f"Loaded BM25 index of {len(self.doc_keys)} documents from {self.path}")
@@ -0,0 +1,105 @@
+import threading
+
+from transformers import AutoModelForCausalLM
+
+from config import get_logger
+
+logger = get_logger("MainModule")
+
+
+class SpeculativeDecoder:
+    """
+    Speculative decoding for the extraction LLM. Tokens are proposed either by a small draft
+    model sharing the tokenizer ("draft") or by n-gram lookup in the prompt ("prompt_lookup"),
+    and the main model verifies all proposals of a step in a single forward pass.
+
+    Forward passes of both models are counted to report tokens per main-model forward, the
+    acceptance rate and tokens/sec. Hugging Face assisted generation only supports batch size 1.
+    """
+    MODES = ("draft", "prompt_lookup")
+
+    def __init__(self, model, mode="prompt_lookup", draft_model=None, num_assistant_tokens=5,
+                 prompt_lookup_num_tokens=10, torch_dtype=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Speculative decoding mode must be one of {self.MODES}")
+        if mode == "draft" and not draft_model:
+            raise ValueError("Speculative decoding with a draft model needs `draft_model`.")
+
+        self.mode = mode
+        self.num_assistant_tokens = num_assistant_tokens
+        self.prompt_lookup_num_tokens = prompt_lookup_num_tokens
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+        self.target_forwards = 0
+        self._hook_forwards(model, "target_forwards")
+
+        self.assistant_model = None
+        if mode == "draft":
+            self.assistant_model = AutoModelForCausalLM.from_pretrained(
+                draft_model,
+                torch_dtype=torch_dtype or model.dtype,
+                device_map=model.device
+            )
+            self.assistant_model.generation_config.num_assistant_tokens = num_assistant_tokens
+            self.draft_forwards = 0
+            self._hook_forwards(self.assistant_model, "draft_forwards")
+
+    def _hook_forwards(self, model, counter):
+        # Hook the uncompiled module so torch.compile does not bypass the counter
+        module = getattr(model, "_orig_mod", model)
+
+        def count(*_):
+            setattr(self, counter, getattr(self, counter) + 1)
+
+        module.register_forward_hook(count)
+
+    def generate_kwargs(self):
+        # Greedy decoding: every proposal that matches the argmax is accepted
+        kwargs = {"do_sample": False}
+        if self.mode == "draft":
+            kwargs["assistant_model"] = self.assistant_model
+        else:
+            kwargs["prompt_lookup_num_tokens"] = self.prompt_lookup_num_tokens
+        return kwargs
+
+    def forward_counts(self):
+        return self.target_forwards, getattr(self, "draft_forwards", 0)
+
+    def record(self, new_tokens, seconds, forwards_before):
+        """
+        Account for one generate call, given the forward counts taken before it.
+        """
+        target_forwards, draft_forwards = self.forward_counts()
+        with self.lock:
+            self.stats_data["calls"] += 1
+            self.stats_data["new_tokens"] += new_tokens
+            self.stats_data["seconds"] += seconds
+            self.stats_data["target_forwards"] += target_forwards - forwards_before[0]
+            self.stats_data["draft_forwards"] += draft_forwards - forwards_before[1]
+
+    def reset_stats(self):
+        self.stats_data = {"calls": 0, "new_tokens": 0, "seconds": 0.0, "target_forwards": 0, "draft_forwards": 0}
+
+    def stats(self):
+        with self.lock:
+            data = dict(self.stats_data)
+
+        # Assisted generation has no separate prefill: every main-model forward verifies the pending
+        # proposals and yields one token of its own on top of the accepted ones.
+        accepted = max(data["new_tokens"] - data["target_forwards"], 0)
+        if self.mode == "draft":
+            # Each draft forward proposes one token (its prefills included, hence a slight underestimate)
+            proposed = data["draft_forwards"]
+        else:
+            # Lookup proposes at most prompt_lookup_num_tokens per step; fewer when no n-gram matches,
+            # so this is a lower bound of the true acceptance rate
+            proposed = data["target_forwards"] * self.prompt_lookup_num_tokens
+
+        return {
+            **data,
+            "mode": self.mode,
+            "tokens_per_sec": round(data["new_tokens"] / data["seconds"], 2) if data["seconds"] else None,
+            "tokens_per_target_forward": round(data["new_tokens"] / data["target_forwards"], 2) if data["target_forwards"] else None,
+            "acceptance_rate": round(accepted / proposed, 3) if proposed else None,
+        }
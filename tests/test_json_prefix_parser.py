@@ -0,0 +1,125 @@
+import typing
+
+import pytest
+from pydantic import BaseModel
+
+from src.json_prefix_parser import JsonPrefixParser, top_level_schema
+
+
+class Skill(BaseModel):
+    name: str
+
+
+class Profile(BaseModel):
+    basics: typing.Optional[Skill] = None
+    skills: typing.List[Skill] = []
+    summary: str = ""
+
+
+def feed(text, top_level_keys=None):
+    parser = JsonPrefixParser(top_level_keys)
+    return parser.feed(text), parser
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "{",
+    ' { "a" : ',
+    '{"a": [1, {"b": "c\\n',
+    '{"a": "\\u00e',
+    '{"a": tr',
+    '{"a": -',
+    '{"a": 1.',
+    '{"a": 1e+',
+])
+def test_accepts_valid_prefixes(text):
+    accepted, parser = feed(text)
+    assert accepted
+    assert not parser.done
+
+
+@pytest.mark.parametrize("text", [
+    "[",
+    '{"a" 1',
+    '{"a": tx',
+    '{"a": "\\x',
+    '{"a": "\\u00g',
+    '{"a": "line\nbreak',
+    '{"a": 1,}',
+    '{"a": [1}',
+    '{"a": 1]',
+    '{"a": ,',
+    "{}}",
+])
+def test_rejects_invalid_prefixes(text):
+    accepted, _ = feed(text)
+    assert not accepted
+
+
+@pytest.mark.parametrize("number", ["0", "-0", "7", "-12", "0.5", "10.25", "1e5", "1E-5", "-2.5e+10", "0e0"])
+def test_accepts_numbers(number):
+    accepted, parser = feed(f'{{"a": {number}}}')
+    assert accepted
+    assert parser.done
+
+
+@pytest.mark.parametrize("number", ["01", "-", "1.", "1e", "1e+", ".5", "+1", "1-2", "1.2.3", "--1"])
+def test_rejects_numbers(number):
+    accepted, _ = feed(f'{{"a": {number}}}')
+    assert not accepted
+
+
+def test_numbers_end_on_delimiters():
+    accepted, parser = feed('{"a": [1, -2.5 ,3e2], "b": 0}')
+    assert accepted
+    assert parser.done
+
+
+def test_nested_containers():
+    text = '{"a": {"b": [[], [{"c": null}], {"d": [true, false]}]}, "e": {}}'
+    accepted, parser = feed(text)
+    assert accepted
+    assert parser.done
+    assert parser.stack == []
+
+
+def test_done_only_after_outer_object_closes():
+    parser = JsonPrefixParser()
+    text = '{"a": {"b": 1}}'
+    for index, char in enumerate(text):
+        assert not parser.done
+        assert parser.feed(char)
+        assert parser.done == (index == len(text) - 1)
+
+
+def test_rejects_text_after_completion():
+    accepted, parser = feed('{"a": 1}')
+    assert accepted and parser.done
+    assert not parser.feed(" ")
+    assert not feed('{"a": 1} {')[0]
+
+
+def test_copy_is_independent():
+    _, parser = feed('{"a": [')
+    branch = parser.copy()
+    assert branch.feed("1]}")
+    assert branch.done
+    assert not parser.done
+    assert parser.stack == ["o", "a"]
+
+
+def test_top_level_schema_maps_containers():
+    assert top_level_schema(Profile) == {"basics": "{", "skills": "[", "summary": None}
+    assert top_level_schema(Profile, keys=["skills"]) == {"skills": "["}
+
+
+def test_top_level_keys_restrict_keys_and_containers():
+    keys = top_level_schema(Profile)
+    assert feed('{"skills": [{"name": "Go"}], "summary": "x"}', keys)[1].done
+    assert feed('{"ski', keys)[0]
+    assert not feed('{"skx', keys)[0]
+    assert not feed('{"skill": ', keys)[0]
+    assert not feed('{"skills": {', keys)[0]
+    assert not feed('{"basics": [', keys)[0]
+    # Nested keys are not restricted
+    assert feed('{"basics": {"anything": 1}}', keys)[1].done
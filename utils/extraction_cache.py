@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from config import get_logger
+
+logger = get_logger("MainModule")
+
+
+class ExtractionCache:
+    """
+    Persistent, content-addressed cache for resume extraction results.
+
+    Every file is identified by the SHA-256 of its bytes. The parsed markdown only depends on
+    the file, while the summary and validated JSON layers are additionally keyed on the model
+    name and prompt version. Entries are evicted least recently used first once the stored
+    payload exceeds max_size_mb.
+    """
+    LAYERS = ("markdown", "summary", "validated")
+    MODEL_LAYERS = ("summary", "validated")
+
+    def __init__(self, db_path, model_name, prompt_version, max_size_mb=512):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.model_name = model_name
+        self.prompt_version = str(prompt_version)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extraction_cache (
+                key TEXT PRIMARY KEY,
+                layer TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_extraction_cache_access ON extraction_cache (last_access);")
+        self.conn.commit()
+        self.total_size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM extraction_cache;").fetchone()[0]
+
+    @staticmethod
+    def content_hash(file_path):
+        """
+        Hash the raw bytes of a file.
+        """
+        hasher = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    def _key(self, content_hash, layer):
+        if layer not in self.LAYERS:
+            raise ValueError(f"Unknown cache layer: {layer}")
+        if layer in self.MODEL_LAYERS:
+            return f"{content_hash}:{layer}:{self.model_name}:{self.prompt_version}"
+        return f"{content_hash}:{layer}"
+
+    def get(self, content_hash, layer):
+        key = self._key(content_hash, layer)
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM extraction_cache WHERE key = ?;", (key,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE extraction_cache SET last_access = ? WHERE key = ?;", (time.time(), key))
+            self.conn.commit()
+        return json.loads(row[0])
+
+    def put(self, content_hash, layer, value):
+        key = self._key(content_hash, layer)
+        payload = json.dumps(value, default=str)
+        size = len(payload.encode("utf-8"))
+
+        with self.lock:
+            previous = self.conn.execute("SELECT size FROM extraction_cache WHERE key = ?;", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO extraction_cache (key, layer, value, size, last_access) VALUES (?, ?, ?, ?, ?);",
+                (key, layer, payload, size, time.time())
+            )
+            self.total_size += size - (previous[0] if previous else 0)
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        """
+        Drop least recently used entries until the cache fits in max_size_bytes.
+        """
+        while self.total_size > self.max_size_bytes:
+            rows = self.conn.execute(
+                "SELECT key, size FROM extraction_cache ORDER BY last_access ASC LIMIT 64;"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self.conn.execute("DELETE FROM extraction_cache WHERE key = ?;", (key,))
+                self.total_size -= size
+                if self.total_size <= self.max_size_bytes:
+                    break
+            logger.info(f"\nEvicted extraction cache entries, size now {self.total_size} bytes")
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM extraction_cache;")
+            self.conn.commit()
+            self.total_size = 0
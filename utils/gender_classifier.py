@@ -1,27 +1,60 @@
 import re
+from collections import defaultdict
 from transformers import pipeline
 
 
+MALE_PRONOUNS = re.compile(r"\b(he|him|his)\b", flags=re.IGNORECASE)
+FEMALE_PRONOUNS = re.compile(r"\b(she|her|hers)\b", flags=re.IGNORECASE)
 
-class GenderClassifier: 
+
+class GenderClassifier:
     """
     Gender classfier model
+
+    Long resumes are split into windows of the model's max length (at most max_windows per text),
+    all windows of a batch of texts go through the model together, and the label scores of a
+    text's windows are summed.
     """
-    def __init__(self, model_name="padmajabfrl/Gender-Classification"):
+    def __init__(self, model_name="padmajabfrl/Gender-Classification", batch_size=16, max_windows=4):
         self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_windows = max_windows
         self.classifier = pipeline("text-classification", model=self.model_name)
+        self.tokenizer = self.classifier.tokenizer
+        self.max_length = min(self.tokenizer.model_max_length, 512)
+
+    def windows(self, text):
+        """
+        Split text into at most max_windows pieces that each fit the model's max length.
+        """
+        input_ids = self.tokenizer(text, add_special_tokens=False)["input_ids"]
+        window = self.max_length - self.tokenizer.num_special_tokens_to_add()
+        pieces = [input_ids[start:start + window] for start in range(0, len(input_ids), window)] or [[]]
+        return [self.tokenizer.decode(piece) for piece in pieces[:self.max_windows]]
 
+    def predict_gender_from_model_batch(self, texts):
+        windows, owners = [], []
+        for index, text in enumerate(texts):
+            for window in self.windows(text):
+                windows.append(window)
+                owners.append(index)
+
+        # Decoded windows can re-tokenize slightly longer, so truncation stays on
+        outputs = self.classifier(
+            windows, batch_size=self.batch_size, truncation=True, max_length=self.max_length, top_k=None
+        )
+        scores = [defaultdict(float) for _ in texts]
+        for index, output in zip(owners, outputs):
+            for prediction in output:
+                scores[index][prediction['label']] += prediction['score']
+        return [max(score, key=score.get) for score in scores]
 
     def predict_gender_from_model(self, text):
-        result = self.classifier(text)
-        return result[0]['label']
-    
+        return self.predict_gender_from_model_batch([text])[0]
+
     def detect_gender_from_regex(self, text):
-        male_pronouns = r"\b(he|him|his)\b"
-        female_pronouns = r"\b(she|her|hers)\b"
-        
-        male_count = len(re.findall(male_pronouns, text, flags=re.IGNORECASE))
-        female_count = len(re.findall(female_pronouns, text, flags=re.IGNORECASE))
+        male_count = len(MALE_PRONOUNS.findall(text))
+        female_count = len(FEMALE_PRONOUNS.findall(text))
 
         if male_count > female_count:
             return "Male"
@@ -29,14 +62,18 @@ class GenderClassifier:
             return "Female"
         else:
             return "Unknown"
-        
-    def __call__(self, text):
-        print("loading the gender classifier model")
-        gender_from_model = self.predict_gender_from_model(text)
-        gender_from_regex = self.detect_gender_from_regex(text)
-        print("loaded the gender classifier model")
-        if gender_from_model == gender_from_regex:
-            return gender_from_regex
-        else:
-            return "Unknown"
 
+    def classify_batch(self, texts):
+        """
+        Classify many resumes with batched model calls. Returns one label per text, in input order.
+        """
+        if not texts:
+            return []
+        genders_from_model = self.predict_gender_from_model_batch(texts)
+        return [
+            gender_from_model if gender_from_model == self.detect_gender_from_regex(text) else "Unknown"
+            for text, gender_from_model in zip(texts, genders_from_model)
+        ]
+
+    def __call__(self, text):
+        return self.classify_batch([text])[0]
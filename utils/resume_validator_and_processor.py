@@ -1,91 +1,112 @@
 import re
 import json
-from pydantic import ValidationError
 
 
 # sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
 
-from .validator import Resume
+from .validation_engine import resume_validator, SectionValidationError
+from config import get_logger
+from src.metrics import VALIDATION_RETRIES, VALIDATION_RESULTS
+
+logger = get_logger("MainModule")
 
 
 class ResumeProcessor:
-    def __init__(self, llm, max_retries = 3):
+    def __init__(self, llm, max_retries = 3, repair_max_new_tokens=None):
         self.llm = llm  
-        self.count = 0
-        self.retry = False
         self.max_retries = max_retries
+        self.repair_max_new_tokens = repair_max_new_tokens
 
     def validate_and_process(self, resume_text, data):
         """
-        Validate the data using the Resume model. If validation fails, rerun the LLM for invalid sections.
+        Validate the data using the Resume model. If validation fails, repair all invalid sections in a
+        single LLM request and validate again, at most max_retries times. Retry state is local to the call,
+        so concurrent resumes sharing this processor do not consume each other's retries.
+        Sections that passed are kept, so a retry only re-validates the sections that were repaired.
+        A repair that returns nothing or leaves the sections unchanged ends the retries, since the same
+        request would produce the same output again.
         """
-        try:
-            print(data)
-            if isinstance(data, re.Match):
-                if data.groups():
-                    data = data.group(1)  # Group 1 contains the matched value
-                else:
-                    data = data.group()  # No groups, return full match
-                if isinstance(data, tuple):
-                    data = data[0]
-                data = json.loads(data)
-                # print(json.dumps(parsed_json, indent=4))
-            print(data)
-            resume = Resume(**data)
-            print("Validation passed.")
-            return resume.dict(), False 
-        except ValidationError as e:
-            print("Validation failed. Errors detected.")
-            error_sections = self.parse_validation_errors(e, data)
-            
-            reprocessed_data = self.rerun_llm_for_errors(error_sections)
-
-            merged_data = self.merge_data(data, reprocessed_data)
-            self.count += 1
-
-            if self.count >= self.max_retries:
-                return f"The resume is not complete and rejected. Following issue occured: \n {e}", False
-            return self.validate_and_process(resume_text, merged_data), False
+        data = self.parse_llm_output(data)
+        if data is None:
+            VALIDATION_RESULTS.inc(outcome="invalid_json")
+            return "The resume could not be extracted: LLM output is not valid JSON.", False
+
+        attempt = 0
+        sections = None
+        validated = {}
+        while True:
+            try:
+                result = resume_validator.validate(data, sections=sections, validated=validated)
+                print("Validation passed.")
+                VALIDATION_RESULTS.inc(outcome="passed")
+                return result, True
+            except SectionValidationError as e:
+                print("Validation failed. Errors detected.")
+                attempt += 1
+                if attempt > self.max_retries:
+                    VALIDATION_RESULTS.inc(outcome="rejected")
+                    return f"The resume is not complete and rejected. Following issue occured: \n {e}", False
+
+                error_sections = self.parse_validation_errors(e, data)
+                VALIDATION_RETRIES.inc()
+                validated = e.validated
+                reprocessed_data = self.rerun_llm_for_errors(resume_text, error_sections)
+                if all(data.get(section) == value for section, value in reprocessed_data.items()):
+                    logger.error(f"Repair of {', '.join(error_sections)} returned no changes, rejecting after {attempt} attempt(s)")
+                    VALIDATION_RESULTS.inc(outcome="rejected")
+                    return f"The resume is not complete and rejected. Following issue occured: \n {e}", False
+                data = self.merge_data(data, reprocessed_data)
+                sections = list(error_sections)
 
     def parse_validation_errors(self, error, original_data):
         """
-        Extract invalid sections from validation errors.
+        Group validation errors by top-level section, together with the section's current content.
         """
         invalid_sections = {}
         for err in error.errors():
             field = err['loc'][0]
-            if field not in original_data:
-                continue
             if field not in invalid_sections:
-                invalid_sections[field] = original_data[field]
+                invalid_sections[field] = {"content": original_data.get(field), "errors": []}
+            location = ".".join(str(part) for part in err['loc'][1:]) or field
+            invalid_sections[field]["errors"].append(f"{location}: {err['msg']}")
         return invalid_sections
 
-    def rerun_llm_for_errors(self, invalid_sections):
+    def rerun_llm_for_errors(self, resume_text, invalid_sections):
         """
-        Rerun the LLM for invalid sections to regenerate their data.
+        Regenerate all invalid sections with one focused LLM request. Without repair_max_new_tokens
+        the LLM sizes the generation from the sections' current JSON.
         """
-        reprocessed_data = {}
-        for section, content in invalid_sections.items():
-            # Convert invalid section back to text for the LLM
-            text_input = f"Invalid section detected: {section}. Data: {content}"
-            print(f"Reprocessing {section}...")
-            self.retry = True
-            regenerated_output = self.llm(text_input, self.retry)
-            # Assuming LLM output is structured correctly, convert it to Python dict
-            reprocessed_data[section] = self.parse_llm_output(regenerated_output)
-        return reprocessed_data
+        print(f"Reprocessing {', '.join(invalid_sections)}...")
+        # Sections missing altogether can only be recovered from the resume itself
+        missing = any(section["content"] is None for section in invalid_sections.values())
+        regenerated_output = self.llm.repair(
+            invalid_sections,
+            source_text=resume_text if missing else None,
+            max_new_tokens=self.repair_max_new_tokens
+        )
+
+        reprocessed_data = self.parse_llm_output(regenerated_output) or {}
+        return {section: value for section, value in reprocessed_data.items() if section in invalid_sections}
 
     def parse_llm_output(self, llm_output):
         """
         Safely parse the LLM output (assuming it's valid JSON format).
         """
+        if isinstance(llm_output, dict):
+            return llm_output
+        if llm_output is None:
+            print("Error: LLM output does not contain a JSON block.")
+            return None
+
+        if isinstance(llm_output, re.Match):
+            llm_output = llm_output.group(1) if llm_output.groups() else llm_output.group()
         try:
-            json_string = llm_output.group()
-            return json.loads(json_string)  
+            data = json.loads(llm_output)
         except json.JSONDecodeError:
             print("Error: LLM output is not valid JSON.")
-            return {}
+            return None
+        return data if isinstance(data, dict) else None
 
     def merge_data(self, original_data, reprocessed_data):
         """
@@ -93,4 +114,4 @@ class ResumeProcessor:
         """
         merged_data = original_data.copy()
         merged_data.update(reprocessed_data)
-        return merged_data
\ No newline at end of file
+        return merged_data
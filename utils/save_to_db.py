@@ -1,6 +1,14 @@
+import io
+import os
+import csv
+import threading
 import psycopg2
 
+from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.extras import execute_values
+
 from config import CONFIG_DATA
+from src.metrics import stage_timer
 
 # PostgreSQL connection parameters
 db_params = {
@@ -11,51 +19,133 @@ db_params = {
     "port": CONFIG_DATA['db_params']['port']
 }
 
+MIGRATIONS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../migrations"))
+
+INSERT_QUERY = """
+INSERT INTO jd_resume_match_result (resume_path, job_description, similarity_score, chunk_id, rank)
+VALUES %s;
+"""
+
+COPY_QUERY = """
+COPY jd_resume_match_result (resume_path, job_description, similarity_score, chunk_id, rank)
+FROM STDIN WITH (FORMAT csv);
+"""
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Lazily create the connection pool shared by every writer in the process.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            pool_config = CONFIG_DATA.get('db_pool', {})
+            _pool = ThreadedConnectionPool(
+                pool_config.get('minconn', 1),
+                pool_config.get('maxconn', 10),
+                **db_params
+            )
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+def result_rows(results):
+    """
+    Convert the ranked query results of one resume into table rows.
+    """
+    return [
+        (
+            result['resume_path'],
+            result['page_content'],
+            result['similarity_score'],
+            result['chunk_id'],
+            index,
+        )
+        for index, result in enumerate(results)
+    ]
+
+
+def _copy_rows(cur, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cur.copy_expert(COPY_QUERY, buffer)
+
+
+def save_many_to_postgresql(results_list, method="values", page_size=1000):
+    """
+    Save the results of many resumes in one transaction on a pooled connection.
+    `method` is either "values" (execute_values) or "copy" (COPY FROM STDIN).
+    """
+    rows = [row for results in results_list for row in result_rows(results)]
+    if not rows:
+        return 0
+
+    with stage_timer("db_write", items=len(rows)):
+        pool = get_pool()
+        conn = pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                if method == "copy":
+                    _copy_rows(cur, rows)
+                elif method == "values":
+                    execute_values(cur, INSERT_QUERY, rows, page_size=page_size)
+                else:
+                    raise ValueError(f"Unknown bulk insert method: {method}")
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"Failed to save data to PostgreSQL: {e}")
+            raise
+        finally:
+            pool.putconn(conn)
+
+    return len(rows)
+
+
 def save_to_postgresql(results):
+    save_many_to_postgresql([results])
+    print("Data saved successfully!")
+
+
+def apply_migrations(migrations_dir=MIGRATIONS_DIR):
+    """
+    Apply every .sql file in migrations_dir that has not been applied yet, in file name order.
+    """
+    conn = psycopg2.connect(**db_params)
+    applied = []
     try:
-        # Connect to PostgreSQL
-        conn = psycopg2.connect(**db_params)
-        cur = conn.cursor()
-
-        for index, result in enumerate(results):
-            query = """
-            INSERT INTO jd_resume_match_result (resume_path, job_description, similarity_score, chunk_id, rank)
-            VALUES (%s, %s, %s, %s, %s);
-            """
-            cur.execute(query, (
-                result['resume_path'],
-                result['page_content'],
-                result['similarity_score'],
-                result['chunk_id'],
-                index,
-            ))
-        
+        with conn.cursor() as cur:
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS schema_migrations (name TEXT PRIMARY KEY, applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW());"
+            )
+            cur.execute("SELECT name FROM schema_migrations;")
+            done = {row[0] for row in cur.fetchall()}
+
+            for name in sorted(os.listdir(migrations_dir)):
+                if not name.endswith(".sql") or name in done:
+                    continue
+                with open(os.path.join(migrations_dir, name), 'r') as file:
+                    cur.execute(file.read())
+                cur.execute("INSERT INTO schema_migrations (name) VALUES (%s);", (name,))
+                applied.append(name)
         conn.commit()
+    finally:
+        conn.close()
 
-        print("Data saved successfully!")
+    print(f"Applied migrations: {applied}")
+    return applied
 
-        cur.close()
-        conn.close()
 
-    except Exception as e:
-        print(f"Failed to save data to PostgreSQL: {e}")
-        raise
-
-# Example usage
-# resume_path = "/path/to/resume.pdf"
-# results = [
-#     {
-#         'page_content': 'Job: machine learning engineer\n Position: AI/ML\n Location: Zurich\n Job Description: [',
-#         'metadata': {},
-#         'similarity_score': 0.43,
-#         'chunk_id': 'id_3658'
-#     },
-#     {
-#         'page_content': 'Job: model\n Position: Artificial Intelligence Intern\n Location: Clamart, Hauts-de-Seine\n Job Description: [',
-#         'metadata': {},
-#         'similarity_score': 0.37,
-#         'chunk_id': 'id_2932'
-#     }
-# ]
-
-# save_to_postgresql(resume_path, results, db_params)
+if __name__ == "__main__":
+    apply_migrations()
@@ -0,0 +1,129 @@
+from typing import List
+from pydantic import TypeAdapter, ValidationError
+
+from .validator import Resume
+
+
+class SectionValidationError(ValueError):
+    """
+    Validation errors of one or more sections, in pydantic's error format with the section name
+    as the first element of every `loc`, so callers can handle it like a ValidationError.
+    `validated` holds the sections that did pass.
+    """
+    def __init__(self, errors, validated=None):
+        self._errors = errors
+        self.validated = validated or {}
+        super().__init__(self.__str__())
+
+    def errors(self):
+        return self._errors
+
+    def __str__(self):
+        lines = [f"{len(self._errors)} validation error(s) for {Resume.__name__}"]
+        for err in self._errors:
+            lines.append(".".join(str(part) for part in err["loc"]))
+            lines.append(f"  {err['msg']} [type={err['type']}]")
+        return "\n".join(lines)
+
+
+def _prefixed(errors, section):
+    """
+    Re-root the errors of a section adapter under the section name.
+    """
+    return [
+        {"type": err["type"], "loc": (section, *err["loc"]), "msg": err["msg"], "input": err.get("input")}
+        for err in errors
+    ]
+
+
+class ResumeValidator:
+    """
+    Validates resume data with validators built once, producing the same data as
+    Resume(**data).model_dump(mode="json").
+
+    - validate(data) checks the whole document with the model; only when it fails are the sections
+      validated one by one with per-field TypeAdapters, to report which ones passed
+    - validate(data, sections=...) only checks the given sections, so a repair retry re-validates
+      just the sections it replaced
+    - validate_many(documents) checks all documents in one List[Resume] adapter call
+    """
+    def __init__(self, model=Resume):
+        self.model = model
+        self.fields = model.model_fields
+        self.adapters = {name: TypeAdapter(field.annotation) for name, field in self.fields.items()}
+        self.bulk_adapter = TypeAdapter(List[model])
+
+    def _missing(self, name):
+        field = self.fields[name]
+        if field.is_required():
+            return None, [{"type": "missing", "loc": (name,), "msg": "Field required", "input": None}]
+        return field.get_default(call_default_factory=True), []
+
+    def validate_section(self, name, value):
+        """
+        Returns (validated JSON-ready value, errors) for one section.
+        """
+        adapter = self.adapters[name]
+        try:
+            return adapter.dump_python(adapter.validate_python(value), mode="json"), []
+        except ValidationError as e:
+            return None, _prefixed(e.errors(), name)
+
+    def validate(self, data, sections=None, validated=None):
+        """
+        Validate `sections` of data (all fields by default) and merge them into `validated`, the
+        already validated sections of a previous call. Raises SectionValidationError listing every
+        failing section and carrying the valid ones; returns the full validated document otherwise.
+        """
+        if sections is None:
+            try:
+                return self.model.model_validate(data).model_dump(mode="json")
+            except ValidationError:
+                pass
+
+        result = dict(validated or {})
+        errors = []
+        for name in (sections if sections is not None else self.fields):
+            if name not in self.fields:
+                continue
+            if name in data:
+                value, section_errors = self.validate_section(name, data[name])
+            else:
+                value, section_errors = self._missing(name)
+            if section_errors:
+                errors.extend(section_errors)
+                result.pop(name, None)
+            else:
+                result[name] = value
+
+        if errors:
+            raise SectionValidationError(errors, validated=result)
+        return {name: result[name] for name in self.fields}
+
+    def validate_many(self, documents):
+        """
+        Bulk mode for stored extractions: returns one (validated data or None, errors) per document.
+        """
+        documents = list(documents)
+        if not documents:
+            return []
+        try:
+            values = self.bulk_adapter.dump_python(self.bulk_adapter.validate_python(documents), mode="json")
+            return [(value, []) for value in values]
+        except ValidationError as e:
+            invalid = {err["loc"][0] for err in e.errors()}
+
+        # Documents that failed are re-checked section by section to attribute their errors
+        results = []
+        for index, data in enumerate(documents):
+            if index not in invalid:
+                results.append((self.model.model_validate(data).model_dump(mode="json"), []))
+                continue
+            try:
+                results.append((self.validate(data, sections=list(self.fields)), []))
+            except SectionValidationError as error:
+                results.append((None, error.errors()))
+        return results
+
+
+resume_validator = ResumeValidator()
@@ -1,14 +1,32 @@
 from pydantic import BaseModel, HttpUrl, EmailStr, Field, validator, field_validator
 from typing import List, Optional, Union, Dict
 from datetime import datetime
+from functools import lru_cache
+
+
+@lru_cache(maxsize=8192)
+def parse_date(value: str) -> datetime.date:
+    """
+    Memoized strptime: extractions repeat the same few dates, and failures are not cached.
+    """
+    return datetime.strptime(value, "%d/%m/%Y").date()
 
 
 # Define the reusable date validator function
-def validate_date_format(value: str) -> datetime.date:
+def validate_date_format(value: str) -> str:
+    """
+    Check the dd/mm/yyyy format. The string itself is kept, since the date fields are typed str.
+    """
+    if value is None:
+        # Left to the field type: allowed for optional dates, "field required" style error otherwise
+        return value
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid date format for {value}. Expected format is 'dd/mm/yyyy'.")
     try:
-        return datetime.strptime(value, "%d/%m/%Y").date()
+        parse_date(value)
     except ValueError:
         raise ValueError(f"Invalid date format for {value}. Expected format is 'dd/mm/yyyy'.")
+    return value
 
 
 class Profile(BaseModel):
@@ -162,7 +180,7 @@ class Resume(BaseModel):
 
     @field_validator("work", "education", mode="before")
     def validate_nested_dates(cls, value):
-        if "startDate" in value and "endDate" in value:
+        if isinstance(value, dict) and "startDate" in value and "endDate" in value:
             if value["startDate"] > value["endDate"]:
                 raise ValueError(
                     f"startDate {value['startDate']} cannot be after endDate {value['endDate']}."